@@ -0,0 +1,144 @@
+"""
+Author: Leo Vidarte <http://nerdlabs.com.ar>
+
+This is free software,
+you can redistribute it and/or modify it
+under the terms of the GPL version 3
+as published by the Free Software Foundation.
+
+"""
+
+"""
+Benchmark every engine over built-in patterns, soups and random fills
+at several world sizes. Reports gens/sec, cells/sec and peak Python
+memory (tracemalloc, so shared memory buffers are not included) and
+writes the results as JSON for comparing runs across commits.
+
+"""
+
+import json
+import os
+import random
+import subprocess
+import time
+import tracemalloc
+
+from engines import ENGINES
+from patterns import patterns
+
+
+SIZES = [64, 256, 1024]
+MEMORY_GENERATIONS = 3
+
+
+def soup(seed, size=16, density=0.5):
+    """A size x size random patch, methuselah-like in behaviour."""
+    rnd = random.Random(seed)
+    return tuple(tuple(1 if rnd.random() < density else 0
+                       for _ in range(size)) for _ in range(size))
+
+
+def fill(seed, width, height, density=0.3):
+    """A random fill of the whole world."""
+    rnd = random.Random(seed)
+    return tuple(tuple(1 if rnd.random() < density else 0
+                       for _ in range(width)) for _ in range(height))
+
+
+def workloads(size):
+    """Yield (name, pattern) pairs for a size x size world."""
+    for name in ('Gosper glider gun', 'Glider', 'Lightweight spaceship',
+                 'Weekender', 'Pentadecathlon, period 15'):
+        yield name, patterns[name]
+    yield 'Soup 16x16', soup(1)
+    yield 'Random fill 30%', fill(1, size, size)
+
+
+def build(engine, size, pattern):
+    life = ENGINES[engine](size, size)
+    x = (size - len(pattern[0])) // 2
+    y = (size - len(pattern)) // 2
+    life.place_pattern((x, y), pattern)
+    return life
+
+
+def close(life):
+    if hasattr(life, 'close'):
+        life.close()
+
+
+def measure(engine, size, pattern, generations, seconds):
+    """Time up to generations steps, stopping after seconds."""
+    life = build(engine, size, pattern)
+    done = 0
+    start = time.time()
+    while done < generations:
+        life.evolve()
+        done += 1
+        if time.time() - start >= seconds:
+            break
+    elapsed = (time.time() - start) or 1e-9
+    population = life.population
+    close(life)
+
+    tracemalloc.start()
+    life = build(engine, size, pattern)
+    for _ in range(min(done, MEMORY_GENERATIONS)):
+        life.evolve()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    close(life)
+
+    return {
+        'generations': done,
+        'seconds': elapsed,
+        'gens_per_sec': done / elapsed,
+        'cells_per_sec': done * size * size / elapsed,
+        'peak_memory': peak,
+        'population': population,
+    }
+
+
+def commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == '__main__':
+
+    from optparse import OptionParser
+    parser = OptionParser(description="Game of life benchmarks")
+    parser.add_option('-e', '--engine', action='append',
+                      choices=list(ENGINES.keys()),
+                      help="engine to run, can be repeated (default: all)")
+    parser.add_option('-s', '--size', action='append', type=int,
+                      help="world size, can be repeated "
+                           "(default: %s)" % ', '.join(map(str, SIZES)))
+    parser.add_option('-g', '--generations', type=int, default=100,
+                      help="generations per case (default: 100)")
+    parser.add_option('-t', '--time', type=float, default=5.0,
+                      help="max seconds per case (default: 5)")
+    parser.add_option('-o', '--output', default='benchmark.json',
+                      help="JSON output file (default: benchmark.json)")
+    args, _ = parser.parse_args()
+
+    results = []
+    for size in args.size or SIZES:
+        for name, pattern in workloads(size):
+            for engine in args.engine or list(ENGINES.keys()):
+                result = measure(engine, size, pattern,
+                                 args.generations, args.time)
+                result.update(engine=engine, size=size, workload=name)
+                results.append(result)
+                print("%-9s %5d %-26s %10.1f gens/s %14.0f cells/s %8d KiB" %
+                      (engine, size, name, result['gens_per_sec'],
+                       result['cells_per_sec'], result['peak_memory'] // 1024))
+
+    with open(args.output, 'w') as f:
+        json.dump({'commit': commit(), 'time': time.time(),
+                   'results': results}, f, indent=2)
@@ -0,0 +1,222 @@
+"""
+Author: Leo Vidarte <http://nerdlabs.com.ar>
+
+This is free software,
+you can redistribute it and/or modify it
+under the terms of the GPL version 3
+as published by the Free Software Foundation.
+
+"""
+
+from functools import partial
+
+from patterns import pattern_cells
+from rules import CONWAY, get_rule
+
+
+def evolve_rows(rows, width, rule=CONWAY):
+    """Next generation of rows[1:-1], using rows[0] and rows[-1] as halo.
+
+    Each row is an int with bit x set for a live cell at column x.
+    Columns wrap around at width. The neighbor count of every cell is
+    kept as four bit planes, and the rule table picks which counts
+    give birth or survival.
+
+    """
+    born, survive = rule.table
+    counts = [(c, born[c], survive[c]) for c in range(9)
+              if born[c] or survive[c]]
+    mask = (1 << width) - 1
+    shift = width - 1
+    # Left and right neighbors of every cell, with wraparound
+    lefts = [((r << 1) | (r >> shift)) & mask for r in rows]
+    rights = [(r >> 1) | ((r & 1) << shift) for r in rows]
+    rows_ = []
+    for y in range(1, len(rows) - 1):
+        a, al, ar = rows[y - 1], lefts[y - 1], rights[y - 1]
+        c, cl, cr = rows[y + 1], lefts[y + 1], rights[y + 1]
+        bl, br = lefts[y], rights[y]
+        # Up row, down row and left/right sums
+        sa = a ^ al ^ ar
+        ca = (a & al) | (ar & (a ^ al))
+        sc = c ^ cl ^ cr
+        cc = (c & cl) | (cr & (c ^ cl))
+        sb = bl ^ br
+        cb = bl & br
+        # Ones bit of the total, and the carry into twos
+        ones = sa ^ sc ^ sb
+        k1 = (sa & sc) | (sb & (sa ^ sc))
+        # Twos bit, and the carries into fours
+        t = ca ^ cc ^ cb
+        k2 = (ca & cc) | (cb & (ca ^ cc))
+        twos = t ^ k1
+        k3 = t & k1
+        # Fours and eights bits
+        fours = k2 ^ k3
+        eights = k2 & k3
+        # Born or survive
+        b = rows[y]
+        row = 0
+        for c, born_, survive_ in counts:
+            m = ((ones if c & 1 else ~ones) & (twos if c & 2 else ~twos) &
+                 (fours if c & 4 else ~fours) & (eights if c & 8 else ~eights))
+            if not born_:
+                m &= b
+            elif not survive_:
+                m &= ~b
+            row |= m
+        rows_.append(row & mask)
+    return rows_
+
+
+def bits(row):
+    """Yield the position of every set bit of row."""
+    while row:
+        low = row & -row
+        yield low.bit_length() - 1
+        row ^= low
+
+
+def row_changes(old, new):
+    """Born and dead cells between two lists of packed rows."""
+    return block_changes([(0, 0, old, new)])
+
+
+def block_changes(blocks):
+    """Born and dead cells of (x0, y0, old rows, new rows) blocks."""
+    births, deaths = [], []
+    for x0, y0, old, new in blocks:
+        for y, (a, b) in enumerate(zip(old, new), y0):
+            if a != b:
+                births.extend((x0 + x, y) for x in bits(b & ~a))
+                deaths.extend((x0 + x, y) for x in bits(a & ~b))
+    return births, deaths
+
+
+class Changes(object):
+    """The births and deaths of one generation, found on first use.
+
+    diff is called with no arguments and returns (births, deaths). Most
+    runs never look at them, so engines keep the states before and
+    after in a diff instead of listing the changed cells every
+    generation.
+
+    """
+
+    def __init__(self, diff=None):
+        self.diff = diff
+        self.cells = None if diff else ([], [])
+
+    def get(self):
+        if self.cells is None:
+            self.cells = self.diff()
+            self.diff = None
+        return self.cells
+
+    @property
+    def births(self):
+        return self.get()[0]
+
+    @property
+    def deaths(self):
+        return self.get()[1]
+
+
+class Diffed(object):
+    """Base of the engines that keep the last generation as Changes.
+
+    evolve() sets self.changes; births and deaths are read from it.
+
+    """
+
+    @property
+    def births(self):
+        return self.changes.births
+
+    @property
+    def deaths(self):
+        return self.changes.deaths
+
+
+def row_masks(cells):
+    """Group cells into a {y: mask of their columns} dict."""
+    masks = {}
+    for x, y in cells:
+        masks[y] = masks.get(y, 0) | (1 << x)
+    return masks
+
+
+def apply_mask(row, mask, mode):
+    """row with the mask bits set ('or'), flipped ('xor') or cleared."""
+    if mode == 'or':
+        return row | mask
+    if mode == 'xor':
+        return row ^ mask
+    if mode == 'clear':
+        return row & ~mask
+    raise ValueError("unknown mode: %s" % mode)
+
+
+class BitLife(Diffed):
+    """Life engine that packs each row into a single int.
+
+    Bit x of rows[y] is the cell (x, y). evolve() runs a bitwise adder
+    over whole rows, so every operation updates the full width at once.
+    Rows are rotated at the edges to keep the wraparound of
+    Life.get_neighbors.
+
+    """
+
+    def __init__(self, width, height, rule=CONWAY):
+        self.width = width
+        self.height = height
+        self.rule = get_rule(rule)
+        self.rows = [0] * height
+        self.changes = Changes()
+
+    def evolve(self):
+        rows = self.rows
+        self.rows = evolve_rows([rows[-1]] + rows + [rows[0]], self.width,
+                                self.rule)
+        # set() changes rows in place, so diff against a copy
+        self.changes = Changes(partial(row_changes, rows, tuple(self.rows)))
+        return self.rows
+
+    def set(self, cell, value):
+        x, y = cell
+        if value:
+            self.rows[y] |= 1 << x
+        else:
+            self.rows[y] &= ~(1 << x)
+
+    def get(self, cell):
+        x, y = cell
+        return (self.rows[y] >> x) & 1
+
+    def _apply(self, cells, mode):
+        rows = self.rows
+        for y, mask in row_masks(cells).items():
+            rows[y] = apply_mask(rows[y], mask, mode)
+
+    def set_many(self, cells, value):
+        self._apply(cells, 'or' if value else 'clear')
+
+    def place_pattern(self, origin, pattern, mode='or'):
+        self._apply(pattern_cells(self, origin, pattern), mode)
+
+    def packed_rows(self):
+        return iter(self.rows)
+
+    def load_packed_rows(self, rows):
+        mask = (1 << self.width) - 1
+        self.rows = [r & mask for r in rows]
+
+    @property
+    def population(self):
+        return sum(bin(r).count('1') for r in self.rows)
+
+    @property
+    def world(self):
+        """The rows unpacked into the Life.world layout."""
+        return [[(r >> x) & 1 for x in range(self.width)]
+                for r in self.rows]
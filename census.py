@@ -0,0 +1,412 @@
+"""
+Author: Leo Vidarte <http://nerdlabs.com.ar>
+
+This is free software,
+you can redistribute it and/or modify it
+under the terms of the GPL version 3
+as published by the Free Software Foundation.
+
+"""
+
+"""
+Soup search: seeded random soups are evolved on a process pool until
+they stabilize, and the objects left behind are counted by name. Each
+soup is written to the output as one JSON line as soon as it is done,
+so nothing but the running totals is kept in memory.
+
+"""
+
+import io
+import json
+import os
+import random
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import formats
+from library import PatternLibrary
+from patterns import rotate
+from rules import CONWAY, RULES, get_rule
+from sparse_life import SparseLife
+
+
+SOUP_SIZE = 16
+DENSITY = 0.5
+MAX_GENERATIONS = 5000
+MAX_PERIOD = 30
+ESCAPE_EVERY = 32 # generations
+MARGIN = 32 # cells around the soup before an object has escaped
+
+
+def soup(seed, index, size=SOUP_SIZE, density=DENSITY):
+    """The live cells of soup number index, the same for every run."""
+    rng = random.Random('%s/%d' % (seed, index))
+    return [(x, y) for y in range(size) for x in range(size)
+            if rng.random() < density]
+
+
+def shape(cells):
+    """Cells moved to the origin, so translations compare equal."""
+    x0 = min(x for x, _ in cells)
+    y0 = min(y for _, y in cells)
+    return frozenset((x - x0, y - y0) for x, y in cells)
+
+
+def orientations(pattern):
+    """The pattern under every rotation, and mirrored."""
+    for p in (pattern, pattern[::-1]):
+        yield p
+        for direction in (90, -90, 180):
+            yield rotate(p, direction)
+
+
+def phases(cells, rule, max_period=MAX_PERIOD):
+    """Shapes of cells in isolation until they repeat, and the period.
+
+    The period is None unless the first shape comes back within
+    max_period generations, so cells still settling down are not
+    periodic.
+
+    """
+    life = SparseLife(0, 0, rule, torus=False)
+    for cell in cells:
+        life.set(cell, 1)
+    shapes = [shape(cells)]
+    for _ in range(max_period):
+        life.evolve()
+        if not life.cells:
+            break
+        s = shape(life.cells)
+        if s == shapes[0]:
+            return shapes, len(shapes)
+        if s in shapes:
+            break
+        shapes.append(s)
+    return shapes, None
+
+
+def cropped_phases(cells, rule, max_period=MAX_PERIOD):
+    """Phases of an emitter, like a gun, cropped to its bounding box.
+
+    An object that emits others never repeats its first shape, but its
+    cells within its own bounding box do. Returns the cells of each
+    phase within the box, relative to its corner, the period (None if
+    they do not repeat within max_period generations), the (width,
+    height) of the box and the cells of the ring around it that come
+    alive within two periods, where the emitted objects leave.
+
+    """
+    x0 = min(x for x, _ in cells)
+    y0 = min(y for _, y in cells)
+    w = max(x for x, _ in cells) - x0 + 1
+    h = max(y for _, y in cells) - y0 + 1
+    ring = set()
+
+    def crop(cells):
+        inside = set()
+        for x, y in cells:
+            x, y = x - x0, y - y0
+            if 0 <= x < w and 0 <= y < h:
+                inside.add((x, y))
+            elif -1 <= x <= w and -1 <= y <= h:
+                ring.add((x, y))
+        return frozenset(inside)
+
+    life = SparseLife(0, 0, rule, torus=False)
+    life.set_many(cells, 1)
+    shapes = [crop(cells)]
+    for _ in range(max_period):
+        life.evolve()
+        s = crop(life.cells)
+        if s == shapes[0]:
+            break
+        shapes.append(s)
+    else:
+        return shapes[:1], None, (w, h), frozenset()
+    for _ in range(len(shapes)):
+        life.evolve()
+        crop(life.cells)
+    return shapes, len(shapes), (w, h), frozenset(ring)
+
+
+def build_index(library, rule, max_period=MAX_PERIOD):
+    """Map every phase of every periodic library pattern to its name.
+
+    Patterns are visited in library order, so the first name of a shape
+    wins ('Glider' rather than 'Glider (90)').
+
+    """
+    index = {}
+    for name in library.names():
+        pattern = library[name]
+        if pattern is None:
+            continue
+        for p in orientations(pattern):
+            cells = [(x, y) for y, row in enumerate(p)
+                            for x, v in enumerate(row) if v == 1]
+            if not cells:
+                continue
+            shapes, period = phases(cells, rule, max_period)
+            if period is None:
+                continue
+            for s in shapes:
+                index.setdefault(s, name)
+    return index
+
+
+def components(cells):
+    """Split cells into groups of cells next to each other."""
+    left = set(cells)
+    while left:
+        stack = [left.pop()]
+        group = []
+        while stack:
+            x, y = stack.pop()
+            group.append((x, y))
+            for dy in (-1, 0, 1):
+                for dx in (-1, 0, 1):
+                    cell = (x + dx, y + dy)
+                    if cell in left:
+                        left.remove(cell)
+                        stack.append(cell)
+        yield group
+
+
+def history(cells, rule, generations):
+    """The cells of each of the next generations, cells in isolation."""
+    life = SparseLife(0, 0, rule, torus=False)
+    life.set_many(cells, 1)
+    steps = [frozenset(cells)]
+    for _ in range(generations):
+        life.evolve()
+        steps.append(frozenset(life.cells))
+    return steps
+
+
+def box(steps):
+    """(x0, y0, x1, y1) around the cells of every step, or None."""
+    cells = [cell for step in steps for cell in step]
+    if not cells:
+        return None
+    xs = [x for x, _ in cells]
+    ys = [y for _, y in cells]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def near(a, b):
+    """Whether a cell of a is at most 2 apart from a cell of b."""
+    if len(a) > len(b):
+        a, b = b, a
+    return any((x + dx, y + dy) in b for x, y in a
+               for dy in range(-2, 3) for dx in range(-2, 3))
+
+
+def split_objects(cells, rule, max_period=MAX_PERIOD):
+    """Split cells into the objects that evolve independently.
+
+    Cells next to each other are grouped first. Two groups are then
+    merged if, within max_period generations, they come at most 2
+    cells apart and evolving them together is not the same as evolving
+    them apart. So two blocks one cell apart are two objects, and a
+    beacon in the phase where its halves do not touch is one.
+
+    """
+    groups = [frozenset(g) for g in components(cells)]
+    histories = [history(g, rule, max_period) for g in groups]
+    boxes = [box(h) for h in histories]
+    i = 0
+    while i < len(groups):
+        for j in range(i + 1, len(groups)):
+            a, b = boxes[i], boxes[j]
+            if a is None or b is None or a[0] > b[2] + 2 or \
+               b[0] > a[2] + 2 or a[1] > b[3] + 2 or b[1] > a[3] + 2:
+                continue
+            a, b = histories[i], histories[j]
+            if not any(near(p, q) for p, q in zip(a, b)):
+                continue
+            joint = history(groups[i] | groups[j], rule, max_period)
+            if joint != [p | q for p, q in zip(a, b)]:
+                groups[i] |= groups.pop(j)
+                histories[i] = joint
+                boxes[i] = box(joint)
+                del histories[j], boxes[j]
+                break
+        else:
+            i += 1
+            continue
+        # The merged group may now interact with an earlier one
+        i = 0
+    return [list(g) for g in groups]
+
+
+def rle(pattern):
+    f = io.StringIO()
+    formats.write_rle(f, pattern)
+    return ''.join(f.getvalue().splitlines()[1:])
+
+
+def code(shapes):
+    """The shortest RLE over every phase and orientation of an object.
+
+    Names objects missing from the library, the same for all of their
+    phases, rotations and reflections.
+
+    """
+    codes = []
+    for s in shapes:
+        rows = [[0] * (max(x for x, _ in s) + 1)
+                for _ in range(max(y for _, y in s) + 1)]
+        for x, y in s:
+            rows[y][x] = 1
+        codes.extend(rle(p) for p in orientations(tuple(map(tuple, rows))))
+    return min(codes, key=lambda c: (len(c), c))
+
+
+def classify(cells, index, rule, max_period=MAX_PERIOD):
+    """The name of an object and its period (None if not periodic)."""
+    shapes, period = phases(cells, rule, max_period)
+    for s in shapes:
+        if s in index:
+            return index[s], period
+    if period is None:
+        return 'unknown %s' % code(shapes[:1]), period
+    if period == 1:
+        return 'still life %s' % code(shapes), period
+    return 'p%d %s' % (period, code(shapes)), period
+
+
+def search(seed, number, index, rule=CONWAY, size=SOUP_SIZE,
+           density=DENSITY, max_generations=MAX_GENERATIONS):
+    """Evolve soup number until it cycles and take a census of it.
+
+    Periodic objects further than MARGIN cells away from the soup are
+    counted and removed as they escape, so spaceships do not keep the
+    rest of the soup from settling.
+
+    """
+    life = SparseLife(0, 0, rule, torus=False)
+    for cell in soup(seed, number, size, density):
+        life.set(cell, 1)
+    low, high = -MARGIN, size + MARGIN
+    objects = Counter()
+    seen = {}
+    period = None
+    generation = 0
+    while generation < max_generations:
+        key = hash(frozenset(life.cells))
+        if key in seen:
+            period = generation - seen[key]
+            break
+        seen[key] = generation
+        life.evolve()
+        generation += 1
+        if generation % ESCAPE_EVERY == 0:
+            escaped = [cell for group in components(life.cells)
+                       if not any(low <= x < high and low <= y < high
+                                  for x, y in group)
+                       for cell in group]
+            for group in split_objects(escaped, rule):
+                name, p = classify(group, index, rule)
+                if p is not None:
+                    objects[name] += 1
+                    for cell in group:
+                        life.set(cell, 0)
+                    seen = {}
+    for group in split_objects(life.cells, rule):
+        objects[classify(group, index, rule)[0]] += 1
+    return {
+        'seed': seed,
+        'soup': number,
+        'generations': generation,
+        'period': period,
+        'population': life.population,
+        'objects': dict(objects),
+    }
+
+
+# Per process pattern index, built for the first soup of each worker
+_indexes = {}
+
+
+def _search(args):
+    seed, number, size, density, rule, directory, max_generations = args
+    key = (rule, directory)
+    if key not in _indexes:
+        _indexes[key] = build_index(PatternLibrary(directory),
+                                    get_rule(rule))
+    return search(seed, number, _indexes[key], get_rule(rule), size,
+                  density, max_generations)
+
+
+def run(output, seed, soups, size=SOUP_SIZE, density=DENSITY, rule=CONWAY,
+        directory=None, max_generations=MAX_GENERATIONS, workers=None):
+    """Search soups 0 to soups - 1 on a process pool.
+
+    Every result is written to output as a JSON line when it arrives,
+    in completion order. At most a few soups per worker are in flight,
+    so memory does not grow with the number of soups. Returns the total
+    count of each object.
+
+    """
+    workers = workers or os.cpu_count() or 1
+    rule = str(get_rule(rule))
+    tasks = ((seed, number, size, density, rule, directory, max_generations)
+             for number in range(soups))
+    totals = Counter()
+    with ProcessPoolExecutor(workers) as executor:
+        pending = set()
+        for task in tasks:
+            pending.add(executor.submit(_search, task))
+            if len(pending) >= workers * 4:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    totals.update(_write(output, future.result()))
+        for future in pending:
+            totals.update(_write(output, future.result()))
+    return totals
+
+
+def _write(output, result):
+    output.write(json.dumps(result, sort_keys=True) + '\n')
+    output.flush()
+    return result['objects']
+
+
+if __name__ == '__main__':
+
+    from optparse import OptionParser
+    parser = OptionParser(description="Random soup search and census")
+    parser.add_option('-n', '--soups', type=int, default=1000,
+                      help="number of soups (default: 1000)")
+    parser.add_option('-s', '--seed', default='0',
+                      help="seed of the soups (default: 0)")
+    parser.add_option('-S', '--size', type=int, default=SOUP_SIZE,
+                      help="soup side (default: %d)" % SOUP_SIZE)
+    parser.add_option('-d', '--density', type=float, default=DENSITY,
+                      help="soup density (default: %s)" % DENSITY)
+    parser.add_option('-g', '--generations', type=int,
+                      default=MAX_GENERATIONS,
+                      help="max generations per soup "
+                           "(default: %d)" % MAX_GENERATIONS)
+    parser.add_option('-j', '--workers', type=int,
+                      help="worker processes (default: CPU count)")
+    parser.add_option('-P', '--patterns', metavar='DIR',
+                      help="also match the pattern files of DIR")
+    parser.add_option('-o', '--output', default='census.jsonl',
+                      help="JSON lines output file (default: census.jsonl)")
+    parser.add_option('-R', '--rule', default='B3/S23',
+                      help="rule in B/S notation or one of: %s "
+                           "(default: B3/S23)" % ', '.join(RULES.keys()))
+    args, _ = parser.parse_args()
+
+    try:
+        rule = get_rule(args.rule)
+        SparseLife(0, 0, rule)
+    except ValueError as e:
+        parser.error(str(e))
+
+    with open(args.output, 'w') as output:
+        totals = run(output, args.seed, args.soups, args.size, args.density,
+                     rule, args.patterns, args.generations, args.workers)
+    for name, count in totals.most_common():
+        print("%8d  %s" % (count, name))
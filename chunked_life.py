@@ -0,0 +1,203 @@
+"""
+Author: Leo Vidarte <http://nerdlabs.com.ar>
+
+This is free software,
+you can redistribute it and/or modify it
+under the terms of the GPL version 3
+as published by the Free Software Foundation.
+
+"""
+
+from functools import partial
+
+from bit_life import (Changes, Diffed, apply_mask, bits, block_changes,
+                      evolve_rows)
+from patterns import pattern_cells
+from rules import CONWAY, require_no_b0
+
+
+class ChunkedLife(Diffed):
+    """Life engine on an unbounded plane made of fixed size chunks.
+
+    Only chunks with live cells are stored, as tuples of chunk x chunk
+    packed rows keyed by chunk coordinates. A chunk is allocated when
+    cells are born in it and freed as soon as it becomes empty, so
+    memory follows the pattern however far it travels. Like TiledLife,
+    only chunks that changed last generation and their neighbors are
+    evaluated.
+
+    width and height are only the default region for packed_rows()
+    and world.
+
+    """
+
+    torus = False
+
+    @property
+    def rule(self):
+        return self._rule
+
+    @rule.setter
+    def rule(self, rule):
+        self._rule = require_no_b0(rule)
+        # Chunks that were stable, and the empty ones around them, may
+        # change under the new rule
+        self.active = set(n for c in self.chunks for n in self.neighbors(c))
+
+    def __init__(self, width, height, rule=CONWAY, chunk=32):
+        self.width = width
+        self.height = height
+        self.chunk = chunk
+        self.chunks = {}
+        self.empty = (0,) * chunk
+        self.rule = rule
+        self.changes = Changes()
+
+    @staticmethod
+    def neighbors(c):
+        cx, cy = c
+        return [(cx + dx, cy + dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1)]
+
+    def evolve(self):
+        chunks = self.chunks
+        changed = {}
+        for c in self.active:
+            chunk = chunks.get(c, self.empty)
+            chunk_ = self.evolve_chunk(c)
+            if chunk_ != chunk:
+                changed[c] = chunk_
+
+        active = set()
+        blocks = []
+        n = self.chunk
+        for c, chunk_ in changed.items():
+            active.update(self.neighbors(c))
+            blocks.append((c[0] * n, c[1] * n, chunks.get(c, self.empty),
+                           chunk_))
+            if any(chunk_):
+                chunks[c] = chunk_
+            else:
+                del chunks[c]
+        self.active = active
+        self.changes = Changes(partial(block_changes, blocks))
+        return self.chunks
+
+    def evolve_chunk(self, c):
+        """Next generation of chunk c, read with a one cell halo."""
+        cx, cy = c
+        n = self.chunk
+        chunks, empty = self.chunks, self.empty
+        up = chunks.get((cx, cy - 1), empty)
+        down = chunks.get((cx, cy + 1), empty)
+        left = [chunks.get((cx - 1, cy + dy), empty) for dy in (-1, 0, 1)]
+        center = chunks.get(c, empty)
+        right = [chunks.get((cx + 1, cy + dy), empty) for dy in (-1, 0, 1)]
+        if not (any(center) or any(up) or any(down) or
+                any(map(any, left)) or any(map(any, right))):
+            return empty
+
+        def row(i, rows, y):
+            l = left[i][y] >> (n - 1) & 1
+            r = right[i][y] & 1
+            return l | (rows[y] << 1) | (r << (n + 1))
+
+        ext = [row(0, up, n - 1)]
+        ext.extend(row(1, center, y) for y in range(n))
+        ext.append(row(2, down, 0))
+        mask = (1 << n) - 1
+        return tuple((r >> 1) & mask
+                     for r in evolve_rows(ext, n + 2, self.rule))
+
+    def _locate(self, cell):
+        x, y = cell
+        cx, x0 = divmod(x, self.chunk)
+        cy, y0 = divmod(y, self.chunk)
+        return (cx, cy), x0, y0
+
+    def set(self, cell, value):
+        c, x, y = self._locate(cell)
+        rows = list(self.chunks.get(c, self.empty))
+        if value:
+            rows[y] |= 1 << x
+        else:
+            rows[y] &= ~(1 << x)
+        if any(rows):
+            self.chunks[c] = tuple(rows)
+        else:
+            self.chunks.pop(c, None)
+        self.active.update(self.neighbors(c))
+
+    def get(self, cell):
+        c, x, y = self._locate(cell)
+        return (self.chunks.get(c, self.empty)[y] >> x) & 1
+
+    def _apply(self, cells, mode):
+        """Update cells one chunk at a time, a row mask per chunk row."""
+        chunks = {}
+        for cell in cells:
+            c, x, y = self._locate(cell)
+            masks = chunks.setdefault(c, {})
+            masks[y] = masks.get(y, 0) | (1 << x)
+        for c, masks in chunks.items():
+            rows = list(self.chunks.get(c, self.empty))
+            for y, mask in masks.items():
+                rows[y] = apply_mask(rows[y], mask, mode)
+            if any(rows):
+                self.chunks[c] = tuple(rows)
+            else:
+                self.chunks.pop(c, None)
+            self.active.update(self.neighbors(c))
+
+    def set_many(self, cells, value):
+        self._apply(cells, 'or' if value else 'clear')
+
+    def place_pattern(self, origin, pattern, mode='or'):
+        self._apply(pattern_cells(self, origin, pattern), mode)
+
+    def live_cells(self, x0, y0, x1, y1):
+        """Yield the live cells within [x0, x1) x [y0, y1)."""
+        n = self.chunk
+        for (cx, cy), chunk in list(self.chunks.items()):
+            if cx * n >= x1 or cy * n >= y1 or \
+               (cx + 1) * n <= x0 or (cy + 1) * n <= y0:
+                continue
+            for y, r in enumerate(chunk, cy * n):
+                if y0 <= y < y1:
+                    for x in bits(r):
+                        x += cx * n
+                        if x0 <= x < x1:
+                            yield (x, y)
+
+    def bounds(self):
+        """(x0, y0, x1, y1) of the allocated chunks, or None if empty."""
+        if not self.chunks:
+            return None
+        n = self.chunk
+        xs = [cx for cx, _ in self.chunks]
+        ys = [cy for _, cy in self.chunks]
+        return (min(xs) * n, min(ys) * n,
+                (max(xs) + 1) * n, (max(ys) + 1) * n)
+
+    def packed_rows(self):
+        rows = [0] * self.height
+        for x, y in self.live_cells(0, 0, self.width, self.height):
+            rows[y] |= 1 << x
+        return rows
+
+    def load_packed_rows(self, rows):
+        for y, r in enumerate(rows):
+            for x in bits(r):
+                self.set((x, y), 1)
+
+    @property
+    def population(self):
+        return sum(bin(r).count('1') for chunk in self.chunks.values()
+                   for r in chunk)
+
+    @property
+    def world(self):
+        """The width x height region in the Life.world layout."""
+        world = [[0] * self.width for _ in range(self.height)]
+        for x, y in self.live_cells(0, 0, self.width, self.height):
+            world[y][x] = 1
+        return world
@@ -0,0 +1,72 @@
+"""
+Author: Leo Vidarte <http://nerdlabs.com.ar>
+
+This is free software,
+you can redistribute it and/or modify it
+under the terms of the GPL version 3
+as published by the Free Software Foundation.
+
+"""
+
+from collections import OrderedDict
+
+from bit_life import bits
+
+
+MASK = (1 << 64) - 1
+
+
+def cell_key(cell):
+    """A pseudo random 64 bit key for a cell (splitmix64 of x, y)."""
+    x, y = cell
+    z = (((x & 0xffffffff) << 32) | (y & 0xffffffff)) + 0x9e3779b97f4a7c15
+    z = ((z ^ (z >> 30)) * 0xbf58476d1ce4e5b9) & MASK
+    z = ((z ^ (z >> 27)) * 0x94d049bb133111eb) & MASK
+    return z ^ (z >> 31)
+
+
+class CycleDetector(object):
+    """Detects when an engine enters a cycle (a still life is period 1).
+
+    The state hash is the XOR of the keys of the live cells, so it is
+    updated from the births and deaths of each generation. The last
+    `size` hashes are remembered with their generation; when a hash
+    comes back, start and period are set and update() returns True.
+
+    Engines whose births and deaths do not cover the whole world (like
+    HashLife, which only diffs its view) expose a hashable `state`
+    instead, equal only for equal worlds, and it is used as the hash.
+
+    """
+
+    def __init__(self, life, size=4096):
+        self.size = size
+        self.generation = 0
+        self.start = self.period = None
+        self.exact = hasattr(life, 'state')
+        if self.exact:
+            self.hash = life.state
+        else:
+            self.hash = 0
+            for y, row in enumerate(life.packed_rows()):
+                for x in bits(row):
+                    self.hash ^= cell_key((x, y))
+        self.seen = OrderedDict([(self.hash, 0)])
+
+    def update(self, life):
+        """Account for the generation life has just evolved to."""
+        self.generation += 1
+        if self.exact:
+            self.hash = life.state
+        else:
+            for cells in (life.births, life.deaths):
+                for cell in cells:
+                    self.hash ^= cell_key(cell)
+        if self.hash in self.seen:
+            self.start = self.seen[self.hash]
+            self.period = self.generation - self.start
+            return True
+        self.seen[self.hash] = self.generation
+        if len(self.seen) > self.size:
+            self.seen.popitem(last=False)
+        return False
@@ -0,0 +1,82 @@
+"""
+Author: Leo Vidarte <http://nerdlabs.com.ar>
+
+This is free software,
+you can redistribute it and/or modify it
+under the terms of the GPL version 3
+as published by the Free Software Foundation.
+
+"""
+
+from math import sqrt
+
+
+class Pyramid(object):
+    """Live cell counts per 2^k x 2^k block, for k = 0 to levels - 1.
+
+    counts[k] maps a block (x >> k, y >> k) to its number of live
+    cells, and only holds the blocks that have any, so counts[0] is the
+    set of live cells itself. A birth or death updates one block per
+    level, so the pyramid follows the births and deaths of an engine at
+    a cost that does not depend on the size of the world.
+
+    """
+
+    def __init__(self, levels):
+        self.levels = levels
+        self.counts = [{} for _ in range(levels)]
+        self.shades = [{} for _ in range(levels)]
+
+    def clear(self):
+        for counts in self.counts:
+            counts.clear()
+
+    def add(self, cell, delta):
+        x, y = cell
+        for k, counts in enumerate(self.counts):
+            block = (x >> k, y >> k)
+            n = counts.get(block, 0) + delta
+            if n:
+                counts[block] = n
+            else:
+                del counts[block]
+
+    def update(self, births, deaths):
+        for cell in births:
+            self.add(cell, 1)
+        for cell in deaths:
+            self.add(cell, -1)
+
+    def shade(self, k, n):
+        """Gray level of a block of level k with n live cells.
+
+        Any live cell gives at least a light gray, and the square root
+        keeps sparse blocks visible next to dense ones.
+
+        """
+        shades = self.shades[k]
+        if n not in shades:
+            shades[n] = 223 - int(223 * sqrt(n / float(1 << (2 * k))))
+        return shades[n]
+
+    def render(self, origin, k, columns, rows):
+        """A columns x rows grayscale image, one level k block per pixel.
+
+        origin is the top left cell of the view. Only the blocks within
+        the view are visited, or only the non empty blocks when there
+        are fewer of them, so the cost is bounded by the screen size.
+
+        """
+        pixels = bytearray(b'\xff' * (columns * rows))
+        counts = self.counts[k]
+        bx, by = origin[0] >> k, origin[1] >> k
+        if len(counts) < columns * rows:
+            blocks = ((x - bx, y - by, n) for (x, y), n in counts.items())
+        else:
+            get = counts.get
+            blocks = ((i, j, get((bx + i, by + j), 0))
+                      for j in range(rows) for i in range(columns))
+        for i, j, n in blocks:
+            if n and 0 <= i < columns and 0 <= j < rows:
+                pixels[j * columns + i] = self.shade(k, n)
+        return pixels
@@ -0,0 +1,121 @@
+"""
+Author: Leo Vidarte <http://nerdlabs.com.ar>
+
+This is free software,
+you can redistribute it and/or modify it
+under the terms of the GPL version 3
+as published by the Free Software Foundation.
+
+"""
+
+from collections import OrderedDict
+
+from bit_life import BitLife
+from chunked_life import ChunkedLife
+from hashlife import HashLife
+from parallel_life import ParallelLife
+from patterns import stamp
+from rules import CONWAY, get_rule
+from sparse_life import SparseLife
+from tiled_life import TiledLife
+
+
+class Life(object):
+    """Reference engine.
+
+    Every engine keeps the cells that were born and the cells that died
+    in its last evolve() call in births and deaths, so callers can
+    update their own view of the world without scanning it. The faster
+    engines only list them when they are first read (bit_life.Changes),
+    so runs that never look at them do not pay for them. The rule
+    (a rules.Rule) can be changed between generations.
+
+    """
+
+    def __init__(self, width, height, rule=CONWAY):
+        self.width = width
+        self.height = height
+        self.rule = get_rule(rule)
+        self.world = [[0] * width for _ in range(height)]
+        self.births = []
+        self.deaths = []
+
+    def evolve(self):
+        world_ = [[0] * self.width for _ in range(self.height)] # all dead
+        self.births = []
+        self.deaths = []
+        table = self.rule.table
+        for x in range(self.width):
+            for y in range(self.height):
+                v = self.world[y][x]
+                n = self.get_neighbors((x, y))
+                t = n.count(1)
+                # Born or survive
+                world_[y][x] = v_ = table[v][t]
+                if v_ != v:
+                    (self.births if v_ else self.deaths).append((x, y))
+        self.world = world_
+        return self.world
+
+    @property
+    def population(self):
+        return sum(map(sum, self.world))
+
+    def get_neighbors(self, cell):
+        x_center, y_center = cell
+
+        x_left  = x_center-1 if x_center-1 >= 0 else self.width-1
+        x_right = x_center+1 if x_center+1 < self.width else 0
+        y_up    = y_center-1 if y_center-1 >= 0 else self.height-1
+        y_down  = y_center+1 if y_center+1 < self.height else 0
+
+        return (self.get((x_left, y_up)),
+                self.get((x_center, y_up)),
+                self.get((x_right, y_up)),
+                self.get((x_left, y_center)),
+                self.get((x_right, y_center)),
+                self.get((x_left, y_down)),
+                self.get((x_center, y_down)),
+                self.get((x_right, y_down)),)
+
+    def set(self, cell, value):
+        x, y = cell
+        self.world[y][x] = value
+
+    def get(self, cell):
+        x, y = cell
+        return self.world[y][x]
+
+    def set_many(self, cells, value):
+        world = self.world
+        for x, y in cells:
+            world[y][x] = value
+
+    def place_pattern(self, origin, pattern, mode='or'):
+        stamp(self, origin, pattern, mode)
+
+    def packed_rows(self):
+        """Yield each row as an int with bit x set for live cell x."""
+        for row in self.world:
+            yield sum(1 << x for x, v in enumerate(row) if v == 1)
+
+    def load_packed_rows(self, rows):
+        self.world = [[(r >> x) & 1 for x in range(self.width)]
+                      for r in rows]
+
+
+ENGINES = OrderedDict([
+    ('python', Life),
+    ('sparse', SparseLife),
+    ('hashlife', HashLife),
+    ('bits', BitLife),
+    ('parallel', ParallelLife),
+    ('tiled', TiledLife),
+    ('chunked', ChunkedLife),
+    ])
+
+try:
+    from numpy_life import NumpyLife
+    ENGINES['numpy'] = NumpyLife
+except ImportError:
+    pass
@@ -0,0 +1,303 @@
+"""
+Author: Leo Vidarte <http://nerdlabs.com.ar>
+
+This is free software,
+you can redistribute it and/or modify it
+under the terms of the GPL version 3
+as published by the Free Software Foundation.
+
+"""
+
+"""
+Animation export: generations are written to an animated GIF or to a
+numbered sequence of PNG files, by encoders written in plain Python
+(zlib for PNG, LZW for GIF). Frames are encoded in another process, so
+the simulation only pays for copying the packed rows of each frame.
+
+"""
+
+import os
+import queue
+import struct
+import zlib
+from multiprocessing import Process, Queue
+
+
+STRIDE = 1 # generations per frame
+DELAY = 100 # milliseconds per GIF frame
+TIMEOUT = 0.1 # seconds between checks that the encoder is alive
+
+
+def pixel_rows(rows, width, scale, dead, alive):
+    """Yield every packed row as bytes, one per pixel of the image.
+
+    Each cell becomes scale x scale pixels of value dead or alive.
+
+    """
+    table = {ord('0'): chr(dead) * scale, ord('1'): chr(alive) * scale}
+    for row in rows:
+        line = format(row, '0%db' % width)[-width:][::-1]
+        line = line.translate(table).encode('latin-1')
+        for _ in range(scale):
+            yield line
+
+
+# ---------
+# PNG
+# ---------
+
+def _chunk(kind, data):
+    return (struct.pack('>I', len(data)) + kind + data +
+            struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+
+def write_png(path, rows, width, scale=1):
+    """Write packed rows as an 8 bit grayscale PNG, live cells black."""
+    lines = b''.join(b'\x00' + line
+                     for line in pixel_rows(rows, width, scale, 255, 0))
+    header = struct.pack('>IIBBBBB', width * scale, len(rows) * scale,
+                         8, 0, 0, 0, 0)
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(_chunk(b'IHDR', header))
+        f.write(_chunk(b'IDAT', zlib.compress(lines)))
+        f.write(_chunk(b'IEND', b''))
+
+
+class PngWriter(object):
+    """Numbered PNG files, run_000042.png for generation 42 of run.png."""
+
+    @staticmethod
+    def check(path, width, height, scale):
+        pass
+
+    def __init__(self, path, width, height, scale=1, delay=DELAY):
+        self.stem, _ = os.path.splitext(path)
+        self.width = width
+        self.scale = scale
+
+    def add(self, generation, rows):
+        write_png('%s_%06d.png' % (self.stem, generation), rows,
+                  self.width, self.scale)
+
+    def close(self):
+        pass
+
+
+# ---------
+# GIF
+# ---------
+
+def lzw(data, min_size=2):
+    """GIF flavoured LZW of a bytes of color indices."""
+    clear = 1 << min_size
+    out = bytearray()
+    size = min_size + 1
+    codes = {}
+    next_code = clear + 2
+    # Codes are packed least significant bit first, after a clear code
+    buf, bits = clear, size
+    prefix = None
+    for c in data:
+        if prefix is None:
+            prefix = c
+            continue
+        key = (prefix << 8) | c
+        code = codes.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        buf |= prefix << bits
+        bits += size
+        while bits >= 8:
+            out.append(buf & 0xff)
+            buf >>= 8
+            bits -= 8
+        if next_code < 4096:
+            codes[key] = next_code
+            next_code += 1
+            if next_code > 1 << size and size < 12:
+                size += 1
+        else:
+            # Table full, start over
+            buf |= clear << bits
+            bits += size
+            codes = {}
+            next_code = clear + 2
+            size = min_size + 1
+        prefix = c
+    if prefix is not None:
+        buf |= prefix << bits
+        bits += size
+    buf |= (clear + 1) << bits
+    bits += size
+    while bits > 0:
+        out.append(buf & 0xff)
+        buf >>= 8
+        bits -= 8
+    return bytes(out)
+
+
+class GifWriter(object):
+    """Animated two color GIF, looping forever."""
+
+    @staticmethod
+    def check(path, width, height, scale):
+        if max(width, height) * scale > 0xffff:
+            raise ValueError("too large for a GIF: %dx%d" % (
+                width * scale, height * scale))
+        # Fail here rather than in the encoder
+        open(path, 'wb').close()
+
+    def __init__(self, path, width, height, scale=1, delay=DELAY):
+        self.width = width
+        self.scale = scale
+        self.delay = max(1, delay // 10)
+        self.f = open(path, 'wb')
+        w, h = width * scale, height * scale
+        self.f.write(b'GIF89a' + struct.pack('<HHBBB', w, h, 0x80, 0, 0))
+        # Palette: white and black
+        self.f.write(b'\xff\xff\xff\x00\x00\x00')
+        self.f.write(b'\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00')
+        self.size = (w, h)
+
+    def add(self, generation, rows):
+        pixels = b''.join(pixel_rows(rows, self.width, self.scale, 0, 1))
+        data = lzw(pixels)
+        f = self.f
+        f.write(b'\x21\xf9\x04\x00' + struct.pack('<H', self.delay) +
+                b'\x00\x00')
+        f.write(b'\x2c' + struct.pack('<HHHHB', 0, 0, self.size[0],
+                                      self.size[1], 0))
+        f.write(b'\x02')
+        for i in range(0, len(data), 255):
+            block = data[i:i + 255]
+            f.write(bytes((len(block),)) + block)
+        f.write(b'\x00')
+
+    def close(self):
+        self.f.write(b'\x3b')
+        self.f.close()
+
+
+WRITERS = {
+    '.gif': GifWriter,
+    '.png': PngWriter,
+}
+
+
+def _encode(frames, errors, path, width, height, scale, delay):
+    try:
+        ext = os.path.splitext(path)[1].lower()
+        writer = WRITERS[ext](path, width, height, scale, delay)
+        try:
+            while True:
+                frame = frames.get()
+                if frame is None:
+                    break
+                writer.add(*frame)
+        finally:
+            writer.close()
+    except Exception as e:
+        errors.put('%s: %s' % (type(e).__name__, e))
+
+
+class Recorder(object):
+    """Streams every stride-th generation of an engine to path.
+
+    The format follows the extension: .gif for an animated GIF, .png
+    for one PNG per frame. Frames go through a queue of queue_size
+    frames to an encoder process. When the queue is full frame() waits
+    for the encoder, or with drop=True skips the frame and counts it in
+    dropped, so a live view never waits.
+
+    A path that can not be written raises ValueError here. If the
+    encoder fails later, the next frame() or close() raises OSError
+    with its error instead of waiting for it.
+
+    """
+
+    def __init__(self, path, width, height, scale=1, stride=STRIDE,
+                 delay=DELAY, queue_size=16, drop=False):
+        ext = os.path.splitext(path)[1].lower()
+        if ext not in WRITERS:
+            raise ValueError("unknown format: %s" % path)
+        directory = os.path.dirname(path) or '.'
+        if not os.path.isdir(directory) or \
+           not os.access(directory, os.W_OK):
+            raise ValueError("can not write to %s" % directory)
+        try:
+            WRITERS[ext].check(path, width, height, scale)
+        except OSError as e:
+            raise ValueError(str(e))
+        self.path = path
+        self.stride = stride
+        self.drop = drop
+        self.frames = 0
+        self.dropped = 0
+        self.queue = Queue(queue_size)
+        self.errors = Queue(1)
+        self.process = Process(target=_encode,
+                               args=(self.queue, self.errors, path, width,
+                                     height, scale, delay))
+        self.process.daemon = True
+        self.process.start()
+
+    def check(self):
+        """Raise OSError if the encoder is gone."""
+        if self.process is None or self.process.is_alive():
+            return
+        self.process = None
+        # Nobody reads the queue any more, do not wait on it at exit
+        self.queue.cancel_join_thread()
+        try:
+            error = self.errors.get(timeout=1)
+        except queue.Empty:
+            error = "exited"
+        raise OSError("encoder failed: %s" % error)
+
+    def put(self, item, block=True):
+        """Queue item, waiting for room only while the encoder lives."""
+        while True:
+            self.check()
+            try:
+                self.queue.put(item, block, TIMEOUT)
+                return True
+            except queue.Full:
+                if not block:
+                    return False
+
+    def frame(self, life, generation):
+        """Record the current world if generation falls on the stride."""
+        if generation % self.stride:
+            return
+        if self.put((generation, list(life.packed_rows())), not self.drop):
+            self.frames += 1
+        else:
+            self.dropped += 1
+
+    def close(self, timeout=None):
+        """Wait for the queued frames to be written and finish the file.
+
+        With a timeout, an encoder still busy after timeout seconds is
+        stopped and OSError is raised.
+
+        """
+        if self.process is None:
+            return
+        self.put(None)
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process = None
+            self.queue.cancel_join_thread()
+            raise OSError("encoder timed out, %s is incomplete" % self.path)
+        if not self.errors.empty():
+            self.check()
+        self.process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
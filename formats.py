@@ -0,0 +1,216 @@
+"""
+Author: Leo Vidarte <http://nerdlabs.com.ar>
+
+This is free software,
+you can redistribute it and/or modify it
+under the terms of the GPL version 3
+as published by the Free Software Foundation.
+
+"""
+
+"""
+Readers and writers for the RLE, Life 1.06 and plaintext (.cells)
+pattern formats. Patterns use the patterns.py layout: a tuple of rows,
+each a tuple of 0/1 cells.
+
+"""
+
+import os
+import re
+
+
+def _from_cells(cells):
+    """Build a pattern from (x, y) live cells, moved to the origin."""
+    if not cells:
+        return ((),)
+    x0 = min(x for x, _ in cells)
+    y0 = min(y for _, y in cells)
+    width = max(x for x, _ in cells) - x0 + 1
+    height = max(y for _, y in cells) - y0 + 1
+    rows = [[0] * width for _ in range(height)]
+    for x, y in cells:
+        rows[y - y0][x - x0] = 1
+    return tuple(tuple(row) for row in rows)
+
+
+def _to_cells(pattern):
+    return [(x, y) for y, row in enumerate(pattern)
+                   for x, v in enumerate(row) if v == 1]
+
+
+# ---------
+# Plaintext
+# ---------
+
+def read_plaintext(f):
+    """Read a plaintext (.cells) pattern.
+
+    Lines starting with '!' are comments, 'O' is a live cell and any
+    other character is a dead one. Short rows are padded with dead
+    cells.
+
+    """
+    rows = [line.rstrip('\r\n') for line in f if not line.startswith('!')]
+    width = max([len(row) for row in rows] or [0])
+    return tuple(tuple(1 if c == 'O' else 0 for c in row.ljust(width, '.'))
+                 for row in rows)
+
+
+def write_plaintext(f, pattern, name=None):
+    if name:
+        f.write('!Name: %s\n' % name)
+    for row in pattern:
+        f.write(''.join('O' if v == 1 else '.' for v in row) + '\n')
+
+
+# ---------
+# RLE
+# ---------
+
+RLE_HEADER = re.compile(r'x\s*=\s*(\d+)\s*,\s*y\s*=\s*(\d+)')
+RLE_TOKEN = re.compile(r'(\d*)([a-zA-Z$!])')
+
+
+def read_rle(f):
+    """Read a run length encoded pattern.
+
+    'b' is a dead cell, '$' ends a row and '!' ends the pattern. Any
+    other letter is taken as a live cell. Raises ValueError for a live
+    cell outside the declared x and y.
+
+    """
+    width = height = None
+    data = []
+    for line in f:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if width is None and line.startswith('x'):
+            m = RLE_HEADER.match(line)
+            if m:
+                width, height = int(m.group(1)), int(m.group(2))
+                continue
+        data.append(line)
+        if '!' in line:
+            break
+
+    cells = []
+    x = y = 0
+    for count, tag in RLE_TOKEN.findall(''.join(data)):
+        n = int(count) if count else 1
+        if tag == '!':
+            break
+        elif tag == '$':
+            x = 0
+            y += n
+        elif tag == 'b':
+            x += n
+        else:
+            cells.extend((x + i, y) for i in range(n))
+            x += n
+
+    rows = _from_cells(cells) if cells else ()
+    if width is None:
+        return rows or ((),)
+    # Keep the declared bounding box, including dead margins
+    world = [[0] * width for _ in range(height)]
+    for x, y in cells:
+        if x >= width or y >= height:
+            raise ValueError("cell (%d, %d) outside of x = %d, y = %d" % (
+                x, y, width, height))
+        world[y][x] = 1
+    return tuple(tuple(row) for row in world)
+
+
+def _encode_row(row):
+    """Run length encode a row, dropping the trailing dead cells."""
+    runs = []
+    for v in row:
+        tag = 'o' if v == 1 else 'b'
+        if runs and runs[-1][1] == tag:
+            runs[-1][0] += 1
+        else:
+            runs.append([1, tag])
+    if runs and runs[-1][1] == 'b':
+        runs.pop()
+    return ''.join('%s%s' % (n if n > 1 else '', tag) for n, tag in runs)
+
+
+def write_rle(f, pattern, name=None, rule='B3/S23'):
+    if name:
+        f.write('#N %s\n' % name)
+    f.write('x = %d, y = %d, rule = %s\n' % (
+            len(pattern[0]) if pattern else 0, len(pattern), rule))
+    body = '$'.join(_encode_row(row) for row in pattern).rstrip('$')
+    body = re.sub(r'\$\$+', lambda m: '%d$' % len(m.group()), body) + '!'
+    line = ''
+    for count, tag in RLE_TOKEN.findall(body):
+        if len(line) + len(count) + 1 > 70:
+            f.write(line + '\n')
+            line = ''
+        line += count + tag
+    f.write(line + '\n')
+
+
+# ---------
+# Life 1.06
+# ---------
+
+def read_life106(f):
+    """Read a Life 1.06 pattern: one 'x y' live cell per line."""
+    cells = []
+    for line in f:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            x, y = line.split()[:2]
+            cells.append((int(x), int(y)))
+    return _from_cells(cells)
+
+
+def write_life106(f, pattern, name=None):
+    f.write('#Life 1.06\n')
+    if name:
+        f.write('#D %s\n' % name)
+    for x, y in _to_cells(pattern):
+        f.write('%d %d\n' % (x, y))
+
+
+READERS = {
+    '.cells': read_plaintext,
+    '.rle': read_rle,
+    '.lif': read_life106,
+    '.life': read_life106,
+}
+
+WRITERS = {
+    '.cells': write_plaintext,
+    '.rle': write_rle,
+    '.lif': write_life106,
+    '.life': write_life106,
+}
+
+
+def read(path):
+    """Read a pattern file, choosing the format by its extension.
+
+    Raises ValueError for a pattern with no live cells, such as an RLE
+    file declaring x = 0, y = 0.
+
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in READERS:
+        raise ValueError("unknown pattern format: %s" % path)
+    with open(path) as f:
+        pattern = READERS[ext](f)
+    if not any(any(row) for row in pattern):
+        raise ValueError("empty pattern: %s" % path)
+    return pattern
+
+
+def write(path, pattern, name=None):
+    """Write a pattern file, choosing the format by its extension."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in WRITERS:
+        raise ValueError("unknown pattern format: %s" % path)
+    with open(path, 'w') as f:
+        WRITERS[ext](f, pattern, name)
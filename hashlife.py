@@ -0,0 +1,348 @@
+"""
+Author: Leo Vidarte <http://nerdlabs.com.ar>
+
+This is free software,
+you can redistribute it and/or modify it
+under the terms of the GPL version 3
+as published by the Free Software Foundation.
+
+"""
+
+from functools import partial
+
+from bit_life import Changes, Diffed, bits
+from patterns import stamp
+from rules import CONWAY, require_no_b0
+
+
+class Node(object):
+    """Canonical quadtree node.
+
+    A node of level k is a 2^k x 2^k square made of four level k-1
+    quadrants. Level 0 nodes are single cells. Nodes are only built
+    through HashLife.join, so equal squares are the same object and
+    can be compared and hashed by identity.
+
+    """
+
+    __slots__ = ('level', 'population', 'nw', 'ne', 'sw', 'se')
+
+    def __init__(self, level, population, nw=None, ne=None, sw=None, se=None):
+        self.level = level
+        self.population = population
+        self.nw = nw
+        self.ne = ne
+        self.sw = sw
+        self.se = se
+
+
+OFF = Node(0, 0)
+ON = Node(0, 1)
+
+
+def live_cells(root, ox, oy, x0, y0, x1, y1):
+    """Yield the live cells of root at ox, oy within [x0, x1) x [y0, y1)."""
+    stack = [(root, ox, oy)]
+    while stack:
+        node, x, y = stack.pop()
+        size = 1 << node.level
+        if node.population == 0 or \
+           x >= x1 or y >= y1 or x + size <= x0 or y + size <= y0:
+            continue
+        if node.level == 0:
+            yield (x, y)
+            continue
+        half = size >> 1
+        stack.append((node.nw, x, y))
+        stack.append((node.ne, x + half, y))
+        stack.append((node.sw, x, y + half))
+        stack.append((node.se, x + half, y + half))
+
+
+class HashLife(Diffed):
+    """Hashlife engine on an unbounded plane.
+
+    advance(n) jumps n generations by recursively memoizing the
+    future of every quadtree node, so regular patterns move ahead by
+    powers of two at roughly constant cost. The node table and the
+    result cache are dropped and rebuilt from the live tree whenever
+    they grow past max_nodes.
+
+    Unlike Life the plane does not wrap: width and height only define
+    the region exported by the world property. births and deaths are
+    only reported within view, (x0, y0, x1, y1).
+
+    """
+
+    torus = False
+
+    @property
+    def rule(self):
+        return self._rule
+
+    @rule.setter
+    def rule(self, rule):
+        self._rule = require_no_b0(rule)
+        # Memoized futures depend on the rule
+        self.results = {}
+
+    def __init__(self, width, height, rule=CONWAY, max_nodes=1000000):
+        self.width = width
+        self.height = height
+        self.rule = rule
+        self.max_nodes = max_nodes
+        self.view = (0, 0, width, height)
+        self.generation = 0
+        self.changes = Changes()
+        self.nodes = {}
+        self.empties = [OFF]
+        self.root = self.empty(3)
+        self.x0 = self.y0 = -(1 << 2)
+
+    # ---------
+    # Quadtree
+    # ---------
+
+    def join(self, nw, ne, sw, se):
+        key = (nw, ne, sw, se)
+        node = self.nodes.get(key)
+        if node is None:
+            population = (nw.population + ne.population +
+                          sw.population + se.population)
+            node = Node(nw.level + 1, population, nw, ne, sw, se)
+            self.nodes[key] = node
+        return node
+
+    def empty(self, level):
+        while len(self.empties) <= level:
+            e = self.empties[-1]
+            self.empties.append(self.join(e, e, e, e))
+        return self.empties[level]
+
+    def expand(self):
+        """Grow the root one level, keeping it in the center."""
+        root = self.root
+        e = self.empty(root.level - 1)
+        self.root = self.join(self.join(e, e, e, root.nw),
+                              self.join(e, e, root.ne, e),
+                              self.join(e, root.sw, e, e),
+                              self.join(root.se, e, e, e))
+        half = 1 << (root.level - 1)
+        self.x0 -= half
+        self.y0 -= half
+
+    def is_padded(self):
+        """True if every live cell is in the inner quarter of the root."""
+        root = self.root
+        if root.level < 3:
+            return False
+        inner = (root.nw.se.se.population + root.ne.sw.sw.population +
+                 root.sw.ne.ne.population + root.se.nw.nw.population)
+        return inner == root.population
+
+    # ---------
+    # Evolution
+    # ---------
+
+    def life_4x4(self, m):
+        """Next generation of the center 2x2 of a level 2 node."""
+        rows = ((m.nw.nw, m.nw.ne, m.ne.nw, m.ne.ne),
+                (m.nw.sw, m.nw.se, m.ne.sw, m.ne.se),
+                (m.sw.nw, m.sw.ne, m.se.nw, m.se.ne),
+                (m.sw.sw, m.sw.se, m.se.sw, m.se.se))
+        table = self.rule.neighborhood
+        cells = []
+        for y in (1, 2):
+            for x in (1, 2):
+                i = 0
+                for dy in (-1, 0, 1):
+                    for dx in (-1, 0, 1):
+                        i = (i << 1) | rows[y + dy][x + dx].population
+                # Born or survive
+                cells.append(ON if table[i] else OFF)
+        return self.join(*cells)
+
+    def successor(self, m, j):
+        """Center of m, 2^j generations ahead (j <= m.level - 2)."""
+        if m.population == 0:
+            return m.nw
+        j = min(j, m.level - 2)
+        key = (m, j)
+        result = self.results.get(key)
+        if result is not None:
+            return result
+
+        if m.level == 2:
+            result = self.life_4x4(m)
+        else:
+            join = self.join
+            nw, ne, sw, se = m.nw, m.ne, m.sw, m.se
+            c1 = self.successor(nw, j)
+            c2 = self.successor(join(nw.ne, ne.nw, nw.se, ne.sw), j)
+            c3 = self.successor(ne, j)
+            c4 = self.successor(join(nw.sw, nw.se, sw.nw, sw.ne), j)
+            c5 = self.successor(join(nw.se, ne.sw, sw.ne, se.nw), j)
+            c6 = self.successor(join(ne.sw, ne.se, se.nw, se.ne), j)
+            c7 = self.successor(sw, j)
+            c8 = self.successor(join(sw.ne, se.nw, sw.se, se.sw), j)
+            c9 = self.successor(se, j)
+            if j < m.level - 2:
+                result = join(join(c1.se, c2.sw, c4.ne, c5.nw),
+                              join(c2.se, c3.sw, c5.ne, c6.nw),
+                              join(c4.se, c5.sw, c7.ne, c8.nw),
+                              join(c5.se, c6.sw, c8.ne, c9.nw))
+            else:
+                result = join(self.successor(join(c1, c2, c4, c5), j),
+                              self.successor(join(c2, c3, c5, c6), j),
+                              self.successor(join(c4, c5, c7, c8), j),
+                              self.successor(join(c5, c6, c8, c9), j))
+
+        self.results[key] = result
+        return result
+
+    def step(self, j):
+        """Advance the world 2^j generations."""
+        while self.root.level < j + 3 or not self.is_padded():
+            self.expand()
+        quarter = 1 << (self.root.level - 2)
+        self.root = self.successor(self.root, j)
+        self.x0 += quarter
+        self.y0 += quarter
+        self.generation += 1 << j
+
+    def advance(self, n):
+        """Advance the world n generations, one power of two per bit."""
+        j = 0
+        while n:
+            if n & 1:
+                self.step(j)
+                if len(self.nodes) > self.max_nodes:
+                    self.collect()
+            n >>= 1
+            j += 1
+        return self.root
+
+    def evolve(self):
+        # Nodes never change, so the old root is enough to diff later
+        before = (self.root, self.x0, self.y0)
+        self.advance(1)
+        self.changes = Changes(partial(self._changes, before,
+                                       (self.root, self.x0, self.y0),
+                                       self.view))
+
+    @staticmethod
+    def _changes(before, after, view):
+        before = set(live_cells(*(before + view)))
+        after = set(live_cells(*(after + view)))
+        return after - before, before - after
+
+    @property
+    def state(self):
+        """The root and its position, a key for the whole world.
+
+        Nodes are canonical, so equal keys are equal worlds. For
+        cycles.CycleDetector, as births and deaths only cover view.
+
+        """
+        return (self.root, self.x0, self.y0)
+
+    def collect(self):
+        """Evict the caches, keeping only the nodes reachable from root."""
+        self.results = {}
+        self.nodes = {}
+        self.empties = [OFF]
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.level == 0:
+                continue
+            key = (node.nw, node.ne, node.sw, node.se)
+            if key not in self.nodes:
+                self.nodes[key] = node
+                stack.extend(key)
+        # Rebuild the empty nodes through the new table
+        self.empty(self.root.level)
+
+    # ---------
+    # Cells
+    # ---------
+
+    def _set(self, node, x, y, value):
+        if node.level == 0:
+            return ON if value else OFF
+        half = 1 << (node.level - 1)
+        nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+        if y < half:
+            if x < half:
+                nw = self._set(nw, x, y, value)
+            else:
+                ne = self._set(ne, x - half, y, value)
+        else:
+            if x < half:
+                sw = self._set(sw, x, y - half, value)
+            else:
+                se = self._set(se, x - half, y - half, value)
+        return self.join(nw, ne, sw, se)
+
+    def set(self, cell, value):
+        x, y = cell
+        while True:
+            size = 1 << self.root.level
+            x1, y1 = x - self.x0, y - self.y0
+            if 0 <= x1 < size and 0 <= y1 < size:
+                break
+            self.expand()
+        self.root = self._set(self.root, x1, y1, value)
+
+    def set_many(self, cells, value):
+        for cell in cells:
+            self.set(cell, value)
+
+    def place_pattern(self, origin, pattern, mode='or'):
+        stamp(self, origin, pattern, mode)
+
+    def get(self, cell):
+        x, y = cell
+        node = self.root
+        x, y = x - self.x0, y - self.y0
+        size = 1 << node.level
+        if not (0 <= x < size and 0 <= y < size):
+            return 0
+        while node.level > 0:
+            if node.population == 0:
+                return 0
+            half = 1 << (node.level - 1)
+            if y < half:
+                node = node.nw if x < half else node.ne
+            else:
+                node = node.sw if x < half else node.se
+            x %= half
+            y %= half
+        return node.population
+
+    def live_cells(self, x0, y0, x1, y1):
+        """Yield the live cells within [x0, x1) x [y0, y1)."""
+        return live_cells(self.root, self.x0, self.y0, x0, y0, x1, y1)
+
+    def packed_rows(self):
+        rows = [0] * self.height
+        for x, y in self.live_cells(0, 0, self.width, self.height):
+            rows[y] |= 1 << x
+        return rows
+
+    def load_packed_rows(self, rows):
+        for y, r in enumerate(rows):
+            for x in bits(r):
+                self.set((x, y), 1)
+
+    @property
+    def population(self):
+        return self.root.population
+
+    @property
+    def world(self):
+        """The width x height region in the Life.world layout."""
+        world = [[0] * self.width for _ in range(self.height)]
+        for x, y in self.live_cells(0, 0, self.width, self.height):
+            world[y][x] = 1
+        return world
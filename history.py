@@ -0,0 +1,142 @@
+"""
+Author: Leo Vidarte <http://nerdlabs.com.ar>
+
+This is free software,
+you can redistribute it and/or modify it
+under the terms of the GPL version 3
+as published by the Free Software Foundation.
+
+"""
+
+import os
+import pickle
+import shutil
+import tempfile
+import zlib
+from array import array
+from collections import OrderedDict
+
+from bit_life import bits
+
+
+class History(object):
+    """Recorder of the generations of an engine.
+
+    Every `interval` generations a keyframe with the packed rows of the
+    world is stored; the generations in between are stored as the list
+    of cells that changed, encoded as y*width+x. Changes are found by
+    XOR-ing the packed rows of consecutive generations, so they match
+    the keyframes whatever the engine reports as births and deaths.
+
+    A keyframe and the changes up to the next one make a segment. The
+    last `window` frames used are kept in memory, as whole segments,
+    and older segments are spilled, compressed, to one file each in a
+    directory (a temporary one unless given). Call close() to remove a
+    temporary directory.
+
+        history = History(life)
+        for _ in range(n):
+            life.evolve()
+            history.record(life)
+        rows = history.seek(123)
+
+    """
+
+    def __init__(self, life, interval=100, window=1000, directory=None):
+        self.width = life.width
+        self.height = life.height
+        self.interval = interval
+        self.window = window
+        self.temporary = directory is None
+        self.directory = directory or tempfile.mkdtemp(prefix='life-')
+        self.segments = OrderedDict()
+        self.spilled = set()
+        self.generation = 0
+        self.rows = list(life.packed_rows())
+        self.segments[0] = [tuple(self.rows)]
+
+    def __len__(self):
+        return self.generation + 1
+
+    def record(self, life):
+        """Store the generation that life has just evolved to."""
+        self.generation += 1
+        rows = list(life.packed_rows())
+        segment, i = divmod(self.generation, self.interval)
+        if i == 0:
+            self.segments[segment] = [tuple(rows)]
+            self._evict()
+        else:
+            width = self.width
+            delta = array('Q', (y * width + x
+                                for y, (a, b) in enumerate(zip(self.rows,
+                                                               rows))
+                                if a != b for x in bits(a ^ b)))
+            self._segment(segment).append(delta)
+        self.rows = rows
+
+    def seek(self, generation):
+        """The packed rows of a generation, rebuilt from its keyframe."""
+        if not 0 <= generation <= self.generation:
+            raise IndexError("generation out of range: %d" % generation)
+        segment, i = divmod(generation, self.interval)
+        frames = self._segment(segment)
+        rows = list(frames[0])
+        for delta in frames[1:i + 1]:
+            self._apply(rows, delta)
+        return rows
+
+    def generations(self, start, stop):
+        """Yield (generation, packed rows) for start <= generation < stop."""
+        stop = min(stop, self.generation + 1)
+        if start >= stop:
+            return
+        rows = self.seek(start)
+        yield start, list(rows)
+        for g in range(start + 1, stop):
+            segment, i = divmod(g, self.interval)
+            frames = self._segment(segment)
+            if i == 0:
+                rows = list(frames[0])
+            else:
+                self._apply(rows, frames[i])
+            yield g, list(rows)
+
+    def close(self):
+        if self.temporary:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _apply(self, rows, delta):
+        width = self.width
+        for i in delta:
+            y, x = divmod(i, width)
+            rows[y] ^= 1 << x
+
+    def _path(self, segment):
+        return os.path.join(self.directory, '%d.segment' % segment)
+
+    def _segment(self, segment):
+        """The frames of a segment, loaded back if it was spilled."""
+        frames = self.segments.get(segment)
+        if frames is not None:
+            self.segments.move_to_end(segment)
+            return frames
+        with open(self._path(segment), 'rb') as f:
+            frames = pickle.loads(zlib.decompress(f.read()))
+        self.segments[segment] = frames
+        self._evict()
+        return frames
+
+    def _evict(self):
+        last = self.generation // self.interval
+        while len(self.segments) * self.interval > self.window and \
+              len(self.segments) > 1:
+            segment, frames = self.segments.popitem(last=False)
+            if segment == last:
+                # The segment being recorded stays in memory
+                self.segments[segment] = frames
+                continue
+            if segment not in self.spilled:
+                with open(self._path(segment), 'wb') as f:
+                    f.write(zlib.compress(pickle.dumps(frames)))
+                self.spilled.add(segment)
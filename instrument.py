@@ -0,0 +1,190 @@
+"""
+Author: Leo Vidarte <http://nerdlabs.com.ar>
+
+This is free software,
+you can redistribute it and/or modify it
+under the terms of the GPL version 3
+as published by the Free Software Foundation.
+
+"""
+
+import cProfile
+import pstats
+import sys
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class Instrument(object):
+    """Wraps any engine and records per generation statistics.
+
+    Every evolve() adds a record with the generation, the seconds spent
+    in evolve, diff and render, the population, the number of births
+    and deaths and the net memory blocks allocated while evolving.
+    Callers time their own diff and render work with phase(), which is
+    added to the latest record. Records are passed to the observers
+    once complete: when the next generation starts or on flush().
+    The last `keep` records are kept in records.
+
+    On a torus the population is kept up to date from births and
+    deaths; unbounded engines, whose births and deaths may only cover
+    a view, are asked for it. advance(n), for the engines that have
+    it, adds a single record for the n generations, with no births or
+    deaths. Everything else is delegated to the wrapped engine.
+
+    """
+
+    _own = ('life', 'observers', 'records', 'pending', 'generation',
+            '_population')
+
+    def __init__(self, life, keep=1000):
+        self.life = life
+        self.observers = []
+        self.records = deque(maxlen=keep)
+        self.pending = None
+        self.generation = 0
+        self._population = life.population
+
+    def __getattr__(self, name):
+        return getattr(self.life, name)
+
+    def __setattr__(self, name, value):
+        if name in self._own:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.life, name, value)
+
+    def subscribe(self, observer):
+        """Call observer(record) for every completed record."""
+        self.observers.append(observer)
+
+    def unsubscribe(self, observer):
+        self.observers.remove(observer)
+
+    def evolve(self):
+        self.flush()
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        world = self.life.evolve()
+        elapsed = time.perf_counter() - start
+        allocations = sys.getallocatedblocks() - blocks
+        births, deaths = len(self.life.births), len(self.life.deaths)
+        self.generation += 1
+        if getattr(self.life, 'torus', True):
+            self._population += births - deaths
+        else:
+            self._population = self.life.population
+        self.pending = {
+            'generation': self.generation,
+            'generations': 1,
+            'evolve': elapsed,
+            'diff': 0.0,
+            'render': 0.0,
+            'population': self._population,
+            'births': births,
+            'deaths': deaths,
+            'allocations': allocations,
+        }
+        self.records.append(self.pending)
+        return world
+
+    @property
+    def advance(self):
+        # Only engines with an advance(n) have one, for hasattr()
+        self.life.advance
+        return self._advance
+
+    def _advance(self, n):
+        self.flush()
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        root = self.life.advance(n)
+        elapsed = time.perf_counter() - start
+        allocations = sys.getallocatedblocks() - blocks
+        self.generation += n
+        self.sync()
+        self.pending = {
+            'generation': self.generation,
+            'generations': n,
+            'evolve': elapsed,
+            'diff': 0.0,
+            'render': 0.0,
+            'population': self._population,
+            'births': 0,
+            'deaths': 0,
+            'allocations': allocations,
+        }
+        self.records.append(self.pending)
+        return root
+
+    def sync(self):
+        """Recount the population from the engine."""
+        self._population = self.life.population
+
+    @contextmanager
+    def phase(self, name):
+        """Add the time spent in the block to the latest record."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.records:
+                self.records[-1][name] += time.perf_counter() - start
+
+    def flush(self):
+        if self.pending is not None:
+            record, self.pending = self.pending, None
+            for observer in self.observers:
+                observer(record)
+
+    def set(self, cell, value):
+        if self.life.get(cell) != value:
+            self._population += 1 if value else -1
+        self.life.set(cell, value)
+
+    def set_many(self, cells, value):
+        self.life.set_many(cells, value)
+        self.sync()
+
+    def place_pattern(self, origin, pattern, mode='or'):
+        self.life.place_pattern(origin, pattern, mode)
+        self.sync()
+
+    def load_packed_rows(self, rows):
+        self.life.load_packed_rows(rows)
+        self.sync()
+
+    @property
+    def population(self):
+        return self._population
+
+    def summary(self, records):
+        """Totals of a list of records, as shown by the overlay."""
+        total = dict.fromkeys(('generations', 'evolve', 'diff', 'render',
+                               'births', 'deaths', 'allocations'), 0)
+        for record in records:
+            for key in total:
+                total[key] += record[key]
+        total['generation'] = self.generation
+        total['population'] = self._population
+        return total
+
+
+@contextmanager
+def profile(path):
+    """Profile the block with cProfile and dump the stats to path.
+
+    The dump can be read with pstats, or turned into a flame graph by
+    tools such as flameprof or snakeviz. The top entries are printed.
+
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        pstats.Stats(profiler, stream=sys.stderr) \
+            .sort_stats('cumulative').print_stats(20)
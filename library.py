@@ -0,0 +1,77 @@
+"""
+Author: Leo Vidarte <http://nerdlabs.com.ar>
+
+This is free software,
+you can redistribute it and/or modify it
+under the terms of the GPL version 3
+as published by the Free Software Foundation.
+
+"""
+
+import os
+from collections import OrderedDict
+from functools import lru_cache
+
+import formats
+from patterns import patterns
+
+
+BUILTIN = object() # index value of the entries of patterns.py
+
+
+class PatternLibrary(object):
+    """Built-in patterns plus the pattern files of a directory.
+
+    Built-in patterns and files are indexed by name when the library is
+    built, but a pattern is only built or parsed the first time it is
+    requested. The last cache_size parsed files are kept in memory. A
+    file named like an entry already indexed is listed as 'name (file)'
+    instead, or by its path if that is taken too.
+
+    Entries whose value is None (section titles and 'One cell') toggle
+    a single cell, like in patterns.py.
+
+    """
+
+    def __init__(self, directory=None, cache_size=128):
+        # name -> BUILTIN, a file path or None for a section title
+        self.index = OrderedDict.fromkeys(patterns, BUILTIN)
+        self.load = lru_cache(maxsize=cache_size)(formats.read)
+        if directory is not None:
+            self.add_directory(directory)
+
+    def add_directory(self, directory):
+        files = sorted(entry.name for entry in os.scandir(directory)
+                       if entry.is_file())
+        self.index['--- %s ---' % os.path.basename(
+            os.path.normpath(directory))] = None
+        for name in files:
+            stem, ext = os.path.splitext(name)
+            if ext.lower() in formats.READERS:
+                path = os.path.join(directory, name)
+                for key in (stem, '%s (%s)' % (stem, name), path):
+                    if key not in self.index:
+                        break
+                self.index[key] = path
+
+    def names(self):
+        return list(self.index.keys())
+
+    def get(self, name, default=None):
+        if name not in self.index:
+            return default
+        return self[name]
+
+    def __getitem__(self, name):
+        entry = self.index[name]
+        if entry is BUILTIN:
+            return patterns[name]
+        if isinstance(entry, str):
+            return self.load(entry)
+        return entry
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __len__(self):
+        return len(self.index)
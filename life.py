@@ -10,37 +10,284 @@ as published by the Free Software Foundation.
 
 import time
 import tkinter as tk
-
-from patterns import patterns
+from functools import partial
+
+from bit_life import bits
+from cycles import CycleDetector
+from density import Pyramid
+from engines import ENGINES, Life
+from export import DELAY, STRIDE, Recorder
+from history import History
+from instrument import Instrument, profile
+from library import PatternLibrary
+from patterns import pattern_cells
+from rules import CONWAY, RULES, get_rule
+from search import PatternIndex, find
+from server import Client, pairs
+from snapshot import Snapshot, save
+from sparse_life import SparseLife
 
 
 STEPS = ['1', '5', '10', '50', '100', '500', 'forever']
 SLEEPS = [0, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1]
+FPS = 30
+GRID_MIN_SIZE = 4 # smaller cells are drawn without grid lines
+CHECKPOINT_EVERY = 1000 # generations
 
 
 class Application(tk.Frame):
 
-    def __init__(self, width, height, size=10):
+    def __init__(self, width, height, size=10, engine=None, library=None,
+                 rule=CONWAY):
         tk.Frame.__init__(self)
         self.grid()
         self.width = width
         self.height = height
         self.size = size
+        self.engine = engine or Life
+        self.library = library or PatternLibrary()
+        self.rule = get_rule(rule)
         self.cells_alive = {}
+        self.highlights = []
+        self.indexes = {}
+        self.origin = (0, 0)
+        self.running = False
+        self.job = None
+        self.checkpoint = None
+        self.checkpoint_every = CHECKPOINT_EVERY
+        self.recorder = None
+        self.record = None
+        self.record_scale = None
+        self.record_stride = STRIDE
+        self.record_delay = DELAY
+        self.keep_history = False
+        self.history = None
+        self.history_start = 0
+        self.shown = None
         self.create_widgets()
         self.init_life()
         self.draw_grid()
         self.create_events()
 
     def init_life(self):
-        self.life = Life(self.width, self.height)
+        if hasattr(getattr(self, 'life', None), 'close'):
+            self.life.close()
+        if self.running:
+            self.stop()
+        self.stop_recording()
+        self.reset_history()
+        self.life = Instrument(
+                self.engine(self.width, self.height, rule=self.rule))
+        self.wrap = getattr(self.life, 'torus', True)
+        self.generation = self.saved = 0
+        self.origin = (0, 0)
         self.clear_screen()
-        self.running = False
+
+    def resume(self, path):
+        """Load the world and generation of a checkpoint file."""
+        self.init_life()
+        with Snapshot(path) as snapshot:
+            snapshot.restore(self.life)
+            self.generation = self.saved = snapshot.generation
+            self.set_rule(snapshot.rule)
+        self.repaint()
+
+    def repaint(self):
+        """Redraw every live cell of the view from the engine."""
+        self.clear_screen()
+        ox, oy = self.origin
+        if hasattr(self.life, 'live_cells'):
+            cells = self.life.live_cells(ox, oy, ox + self.width,
+                                         oy + self.height)
+        else:
+            cells = ((x, y) for y, row in enumerate(self.life.packed_rows())
+                            for x in bits(row))
+        for cell in cells:
+            self.paint_cell(cell)
+        self.refresh()
+
+    def visible(self, cell):
+        x, y = cell
+        ox, oy = self.origin
+        return ox <= x < ox + self.width and oy <= y < oy + self.height
+
+    def to_screen(self, cell):
+        """Canvas coordinates of the top left corner of a cell."""
+        x, y = cell
+        ox, oy = self.origin
+        return (x - ox) * self.size, (y - oy) * self.size
+
+    def to_world(self, x, y):
+        """The cell under the canvas coordinates x, y."""
+        ox, oy = self.origin
+        return x // self.size + ox, y // self.size + oy
+
+    def pan_step(self, dx, dy):
+        """Cells panned by an arrow key."""
+        return dx * max(1, self.width // 4), dy * max(1, self.height // 4)
+
+    def pan(self, dx, dy):
+        """Move the view over an unbounded world by dx, dy cells."""
+        if self.wrap or not (dx or dy):
+            return
+        ox, oy = self.origin = (self.origin[0] + dx, self.origin[1] + dy)
+        if hasattr(self.life, 'view'):
+            self.life.view = (ox, oy, ox + self.width, oy + self.height)
+            self.life.sync()
+        self.repaint()
+        if not self.running:
+            self.status.config(text = "View at %d, %d" % self.origin)
+
+    def set_rule(self, name):
+        try:
+            rule = get_rule(name)
+            self.life.rule = rule
+        except ValueError as e:
+            self.status.config(text = str(e))
+            self.rule_name.set(str(self.rule))
+            return
+        self.rule = rule
+        self.rule_name.set(name if name in RULES else str(rule))
+        if self.running:
+            self.detector = CycleDetector(self.life)
+            self.first = self.generation
+
+    def save_checkpoint(self):
+        save(self.checkpoint, self.life, self.generation)
+        self.saved = self.generation
+
+    def reset_history(self):
+        """Forget the recorded generations, the world was edited."""
+        self.show_live()
+        if self.history is not None:
+            self.history.close()
+            self.history = None
+
+    def show_history(self, delta):
+        """Show the recorded generation delta generations away.
+
+        Only while stopped; going past the current generation shows the
+        world again.
+
+        """
+        if self.running or self.history is None:
+            return
+        g = (self.generation if self.shown is None else self.shown) + delta
+        g = max(g, self.history_start)
+        if g >= self.generation:
+            self.show_live()
+            self.status.config(text = "Generation %d" % self.generation)
+            return
+        self.shown = g
+        rows = self.history.seek(g - self.history_start)
+        self.clear_screen()
+        for y, row in enumerate(rows):
+            for x in bits(row):
+                if self.visible((x, y)):
+                    self.paint_cell((x, y))
+        self.refresh()
+        self.status.config(text = "Generation %d of %d" % (
+            g, self.generation))
+
+    def show_live(self):
+        if self.shown is not None:
+            self.shown = None
+            self.repaint()
+
+    def toggle_recording(self):
+        if self.recorder is None:
+            self.start_recording()
+        else:
+            self.stop_recording()
+
+    def start_recording(self):
+        """Record every record_stride-th generation from now on.
+
+        Frames go to the record path, or to a new life_<time>.gif. The
+        recorder drops the frames its encoder can not keep up with, so
+        the simulation never waits for it.
+
+        """
+        path = self.record or time.strftime('life_%Y%m%d_%H%M%S.gif')
+        try:
+            self.recorder = Recorder(path, self.width, self.height,
+                                     self.record_scale or self.size,
+                                     self.record_stride, self.record_delay,
+                                     drop=True)
+        except ValueError as e:
+            self.status.config(text = str(e))
+            return
+        self.btn_record.config(relief=tk.SUNKEN)
+        self.status.config(text = "Recording to %s" % path)
+        self.record_frame()
+
+    def record_frame(self):
+        if self.recorder is None:
+            return
+        try:
+            self.recorder.frame(self.life, self.generation)
+        except OSError:
+            self.stop_recording()
+
+    def stop_recording(self):
+        recorder = self.recorder
+        if recorder is None:
+            return
+        self.recorder = None
+        self.btn_record.config(relief=tk.RAISED)
+        try:
+            recorder.close()
+        except OSError as e:
+            self.status.config(text = str(e))
+            return
+        self.status.config(text = "Recorded %d frames to %s, %d dropped" % (
+            recorder.frames, recorder.path, recorder.dropped))
 
     def clear_screen(self):
         for id in self.cells_alive.values():
             self.canvas.delete(id)
         self.cells_alive = {}
+        self.clear_highlights()
+
+    def clear_highlights(self):
+        for id in self.highlights:
+            self.canvas.delete(id)
+        self.highlights = []
+
+    def find_pattern(self):
+        """Highlight every occurrence of the selected pattern.
+
+        With a section title selected, all the patterns of the section
+        are searched for.
+
+        """
+        self.clear_highlights()
+        names = self.lst_patterns.get(0, tk.END)
+        i = self.lst_patterns.curselection()[0]
+        try:
+            if self.library[names[i]] is not None:
+                selected = [names[i]]
+            else:
+                selected = []
+                for name in names[i + 1:]:
+                    if self.library[name] is None:
+                        break
+                    selected.append(name)
+            key = (tuple(selected), str(self.life.rule))
+            if key not in self.indexes:
+                self.indexes[key] = PatternIndex(
+                        [(name, self.library[name]) for name in selected],
+                        self.life.rule)
+        except ValueError as e:
+            self.status.config(text = str(e))
+            return
+        matches = list(find(self.life, self.indexes[key], self.origin))
+        for name, x, y, width, height in matches:
+            x0, y0 = self.to_screen((x, y))
+            x1, y1 = self.to_screen((x + width, y + height))
+            self.highlights.append(self.canvas.create_rectangle(
+                    x0 - 1, y0 - 1, x1 + 1, y1 + 1, outline='red', width=2))
+        self.status.config(text = "%d found" % len(matches))
 
     def create_widgets(self):
         width = self.width * self.size
@@ -71,6 +318,25 @@ class Application(tk.Frame):
                 sidebar, self.sleep, *SLEEPS)
         opt_sleep.grid()
 
+        tk.Label(sidebar, text='Rule').grid()
+
+        rules = list(RULES.keys())
+        names = dict((v, k) for k, v in RULES.items())
+        self.rule_name = tk.StringVar()
+        self.rule_name.set(names.get(str(self.rule), str(self.rule)))
+        if self.rule_name.get() not in rules:
+            rules.append(self.rule_name.get())
+        opt_rule = self.opt_rule = tk.OptionMenu(
+                sidebar, self.rule_name, *rules, command=self.set_rule)
+        opt_rule.grid()
+
+        self.show_stats = tk.BooleanVar()
+        chk_stats = tk.Checkbutton(sidebar, text='Stats',
+                                   variable=self.show_stats,
+                                   command=self.draw_stats)
+        chk_stats.grid()
+        self.overlay = None
+
         separator = tk.Frame(sidebar, height=2, bd=1, relief=tk.SUNKEN)
         separator.grid(sticky=tk.E+tk.W, padx=5, pady=10)
 
@@ -80,6 +346,10 @@ class Application(tk.Frame):
         self.btn_stop = tk.Button(sidebar, text="Stop", command=self.stop)
         self.btn_stop.grid()
 
+        self.btn_record = tk.Button(sidebar, text="Record",
+                                    command=self.toggle_recording)
+        self.btn_record.grid()
+
         self.btn_clear = tk.Button(sidebar, text="Clear",
                                    command=self.init_life)
         self.btn_clear.grid()
@@ -91,6 +361,10 @@ class Application(tk.Frame):
                 sidebar, text="Patterns", command=self.show_patterns)
         btn_patterns.grid()
 
+        self.btn_find = tk.Button(sidebar, text="Find",
+                                  command=self.find_pattern)
+        self.btn_find.grid()
+
         # ---------------
         # Patterns Window
         # ---------------
@@ -105,8 +379,7 @@ class Application(tk.Frame):
         lst_patterns = self.lst_patterns = tk.Listbox(
                 win_patterns, yscrollcommand=scrollbar.set,
                 height=20, width=30)
-        for item in patterns.keys():
-            lst_patterns.insert(tk.END, item)
+        lst_patterns.insert(tk.END, *self.library.names())
         lst_patterns.selection_set(0)
 
         scrollbar.config(command=lst_patterns.yview)
@@ -122,6 +395,8 @@ class Application(tk.Frame):
         self.win_patterns.deiconify()
 
     def draw_grid(self):
+        if self.size < GRID_MIN_SIZE:
+            return
         color = 'gray'
         for i in range(self.width - 1):
             x = (self.size * i) + self.size
@@ -136,17 +411,51 @@ class Application(tk.Frame):
 
     def create_events(self):
         self.canvas.bind_all('<Button-1>', self.draw)
+        # Panning, for unbounded worlds
+        pan, step = self.pan, self.pan_step
+        self.canvas.bind_all('<Left>', lambda e: pan(*step(-1, 0)))
+        self.canvas.bind_all('<Right>', lambda e: pan(*step(1, 0)))
+        self.canvas.bind_all('<Up>', lambda e: pan(*step(0, -1)))
+        self.canvas.bind_all('<Down>', lambda e: pan(*step(0, 1)))
+        self.canvas.bind('<MouseWheel>',
+                         lambda e: pan(*step(0, -1 if e.delta > 0 else 1)))
+        self.canvas.bind('<Button-4>', lambda e: pan(*step(0, -1)))
+        self.canvas.bind('<Button-5>', lambda e: pan(*step(0, 1)))
+        self.canvas.bind('<Button-3>', self.drag_start)
+        # Back and forward through the recorded generations
+        self.canvas.bind_all('<comma>', lambda e: self.show_history(-1))
+        self.canvas.bind_all('<period>', lambda e: self.show_history(1))
+        self.canvas.bind_all('<less>', lambda e: self.show_history(-10))
+        self.canvas.bind_all('<greater>', lambda e: self.show_history(10))
+        self.canvas.bind('<B3-Motion>', self.drag)
+
+    def drag_start(self, event):
+        self.drag_from = self.to_world(event.x, event.y)
+
+    def drag(self, event):
+        # Keep the cell where the drag started under the pointer
+        x, y = self.to_world(event.x, event.y)
+        x0, y0 = self.drag_from
+        self.pan(x0 - x, y0 - y)
 
     def draw(self, event):
         if isinstance(event.widget, tk.Canvas):
-            x = event.x // self.size
-            y = event.y // self.size
+            x, y = self.to_world(event.x, event.y)
             items = self.lst_patterns.curselection()
-            pattern = patterns[self.lst_patterns.get(items[0])]
+            try:
+                pattern = self.library[self.lst_patterns.get(items[0])]
+            except ValueError as e:
+                self.status.config(text = str(e))
+                return
+            self.reset_history()
             if pattern is None:
                 self.toggle_cell((x, y))
             else:
                 self.toggle_pattern((x, y), pattern)
+            self.refresh()
+            if self.running:
+                self.detector = CycleDetector(self.life)
+                self.first = self.generation
 
     def toggle_cell(self, cell):
         if cell in self.cells_alive:
@@ -161,127 +470,429 @@ class Application(tk.Frame):
             self.draw_pattern(cell, pattern)
 
     def pattern_in_cells_alive(self, cell, pattern):
-        x, y = cell
-        for x0 in range(len(pattern[0])):
-            for y0 in range(len(pattern)):
-                x1 = (x + x0) % self.width
-                y1 = (y + y0) % self.height
-                if pattern[y0][x0] == 1 and \
-                   (x1, y1) not in self.cells_alive:
-                    return False
-        return True
+        return all(c in self.cells_alive
+                   for c in pattern_cells(self.life, cell, pattern))
 
     def draw_cell(self, cell):
-        x, y = cell
-        x0 = x * self.size
-        y0 = y * self.size
+        self.paint_cell(cell)
+        self.life.set(cell, 1)
+
+    def del_cell(self, cell):
+        self.erase_cell(cell)
+        self.life.set(cell, 0)
+
+    def paint_cell(self, cell):
+        x0, y0 = self.to_screen(cell)
         x1 = x0 + self.size
         y1 = y0 + self.size
         id = self.canvas.create_rectangle(x0, y0, x1, y1,
                                           width=0, fill='black')
         self.cells_alive[cell] = id
-        self.life.set(cell, 1)
 
-    def del_cell(self, cell):
-        x, y = cell
+    def erase_cell(self, cell):
         self.canvas.delete(self.cells_alive[cell])
         del self.cells_alive[cell]
-        self.life.set(cell, 0)
+
+    def refresh(self):
+        """Flush painted cells to the screen (cells are canvas items)."""
+        pass
 
     def draw_pattern(self, cell, pattern):
-        x, y = cell
-        for x0 in range(len(pattern[0])):
-            for y0 in range(len(pattern)):
-                x1 = (x + x0) % self.width
-                y1 = (y + y0) % self.height
-                if pattern[y0][x0] == 1 and not (x1, y1) in self.cells_alive:
-                    self.draw_cell((x1, y1))
+        self.place_pattern(cell, pattern, 'or')
 
     def del_pattern(self, cell, pattern):
-        x, y = cell
-        for x0 in range(len(pattern[0])):
-            for y0 in range(len(pattern)):
-                x1 = (x + x0) % self.width
-                y1 = (y + y0) % self.height
-                if pattern[y0][x0] == 1 and (x1, y1) in self.cells_alive:
-                    self.del_cell((x1, y1))
+        self.place_pattern(cell, pattern, 'clear')
+
+    def place_pattern(self, cell, pattern, mode='or'):
+        """Place pattern in one engine call, then repaint its cells."""
+        self.life.place_pattern(cell, pattern, mode)
+        for c in pattern_cells(self.life, cell, pattern):
+            if not self.visible(c):
+                continue
+            alive = c in self.cells_alive
+            if not alive and mode != 'clear':
+                self.paint_cell(c)
+            elif alive and mode != 'or':
+                self.erase_cell(c)
 
     def run(self):
+        if self.running or not self.life.population:
+            return
+        self.show_live()
+        if self.keep_history and self.history is None:
+            self.history = History(self.life)
+            self.history_start = self.generation
         self.running = True
-        steps = self.steps.get()
+        self.step = 0
+        self.detector = CycleDetector(self.life)
+        self.first = self.generation
         self.opt_steps.config(state=tk.DISABLED)
-        if steps == 'forever':
-            step = 1
-            while self.running and self.cells_alive:
-                self._run(step, steps)
-                step += 1
-        else:
-            for step in range(int(steps)):
-                if not self.running or not self.cells_alive:
+        self.job = self.after(0, self._run)
+
+    def _run(self):
+        """Evolve for one frame, then draw the latest generation.
+
+        With no sleep as many generations as fit in a frame are
+        evolved and only the last one is drawn, so the simulation is
+        not capped by the refresh rate. Control returns to the Tk event
+        loop between frames, which keeps the buttons responsive.
+
+        """
+        self.job = None
+        self.clear_highlights()
+        steps = self.steps.get()
+        total = None if steps == 'forever' else int(steps)
+        sleep = float(self.sleep.get())
+        deadline = time.time() + 1.0 / FPS
+        changed = set()
+        first = self.step
+        while self.running and (total is None or self.step < total):
+            self.life.evolve()
+            self.step += 1
+            self.generation += 1
+            changed.symmetric_difference_update(self.life.births)
+            changed.symmetric_difference_update(self.life.deaths)
+            self.record_frame()
+            if self.history is not None:
+                self.history.record(self.life)
+            if self.detector.period is None and \
+               self.detector.update(self.life):
+                if total is None:
+                    self.running = False
                     break
-                self._run(step, steps)
+                # Keep every generation when recording
+                if self.history is None and self.recorder is None:
+                    self.skip_cycles(total, changed)
+            if sleep or time.time() >= deadline:
+                break
+        with self.life.phase('diff'):
+            for cell in changed:
+                if cell in self.cells_alive:
+                    self.erase_cell(cell)
+                elif self.visible(cell):
+                    self.paint_cell(cell)
+        with self.life.phase('render'):
+            self.refresh()
+        self.draw_stats(self.step - first)
+        self.life.flush()
+        self.status.config(text = "Running %s/%s" % (self.step, steps))
+        if self.checkpoint and \
+           self.generation - self.saved >= self.checkpoint_every:
+            self.save_checkpoint()
+        if self.running and self.life.population and \
+           (total is None or self.step < total):
+            self.job = self.after(int(sleep * 1000) or 1, self._run)
+        else:
+            self.stop()
+            if self.detector.period is not None:
+                self.status.config(text = "Period %d from generation %d" % (
+                    self.detector.period, self.first + self.detector.start))
+
+    def skip_cycles(self, total, changed):
+        """Skip the whole periods left of a run, the states repeat."""
+        left = total - self.step
+        for _ in range(left % self.detector.period):
+            self.life.evolve()
+            changed.symmetric_difference_update(self.life.births)
+            changed.symmetric_difference_update(self.life.deaths)
+        self.step = total
+        self.generation += left
+
+    def draw_stats(self, generations=1):
+        """Show the totals of the last frame on top of the canvas."""
+        if not self.show_stats.get():
+            if self.overlay is not None:
+                self.canvas.delete(self.overlay)
+                self.overlay = None
+            return
+        records = list(self.life.records)[-generations:] if generations \
+                  else []
+        s = self.life.summary(records)
+        s['generation'] = self.generation
+        text = ("gen %d (%d in frame)\n"
+                "evolve %.1f ms  diff %.1f ms  render %.1f ms\n"
+                "population %d  +%d -%d  alloc %d" % (
+                    s['generation'], s['generations'], s['evolve'] * 1000,
+                    s['diff'] * 1000, s['render'] * 1000, s['population'],
+                    s['births'], s['deaths'], s['allocations']))
+        if self.overlay is None:
+            self.overlay = self.canvas.create_text(
+                    4, 4, anchor=tk.NW, fill='blue', text=text)
+        else:
+            self.canvas.itemconfig(self.overlay, text=text)
+        self.canvas.tag_raise(self.overlay)
+
+    def stop(self):
+        self.running = False
+        if self.checkpoint and self.generation != self.saved:
+            self.save_checkpoint()
+        if self.job is not None:
+            self.after_cancel(self.job)
+            self.job = None
         self.status.config(text = "Idle")
         self.opt_steps.config(state=tk.NORMAL)
 
-    def _run(self, step, steps):
-        self.status.config(text = "Running %s/%s" % (step, steps))
-        self.life.evolve()
-        self.clear_screen()
-        for x in range(self.width):
-            for y in range(self.height):
-                if self.life.get((x, y)) == 1:
-                    self.toggle_cell((x, y))
-        self.canvas.update()
-        time.sleep(float(self.sleep.get()))
 
-    def stop(self):
-        self.running = False
+class ImageApplication(Application):
+    """Application that renders the world into a single image.
 
-class Life(object):
+    Cells are pixels of a width x height grayscale buffer, which is
+    blitted and zoomed by the cell size in one call per frame instead
+    of keeping one canvas item per live cell.
 
-    def __init__(self, width, height):
-        self.width = width
-        self.height = height
-        self.world = [[0] * width for _ in range(height)]
-
-    def evolve(self):
-        world_ = [[0] * self.width for _ in range(self.height)] # all dead
-        for x in range(self.width):
-            for y in range(self.height):
-                v = self.world[y][x]
-                n = self.get_neighbors((x, y))
-                t = n.count(1)
-                # Born or survive
-                if (v == 0 and t == 3) or \
-                   (v == 1 and t in (2, 3)):
-                    world_[y][x] = 1
-        self.world = world_
-        return self.world
-
-    def get_neighbors(self, cell):
-        x_center, y_center = cell
-
-        x_left  = x_center-1 if x_center-1 >= 0 else self.width-1
-        x_right = x_center+1 if x_center+1 < self.width else 0
-        y_up    = y_center-1 if y_center-1 >= 0 else self.height-1
-        y_down  = y_center+1 if y_center+1 < self.height else 0
-
-        return (self.get((x_left, y_up)),
-                self.get((x_center, y_up)),
-                self.get((x_right, y_up)),
-                self.get((x_left, y_center)),
-                self.get((x_right, y_center)),
-                self.get((x_left, y_down)),
-                self.get((x_center, y_down)),
-                self.get((x_right, y_down)),)
-
-    def set(self, cell, value):
+    """
+
+    def create_widgets(self):
+        Application.create_widgets(self)
+        self.pixels = bytearray(b'\xff' * (self.width * self.height))
+        self.image = tk.PhotoImage(width=self.width, height=self.height)
+        self.scaled = tk.PhotoImage(width=self.width * self.size,
+                                    height=self.height * self.size)
+        self.canvas.create_image(0, 0, image=self.scaled, anchor=tk.NW)
+
+    def clear_screen(self):
+        self.pixels[:] = b'\xff' * len(self.pixels)
+        self.cells_alive = {}
+        self.clear_highlights()
+        self.refresh()
+
+    def paint_cell(self, cell):
         x, y = cell
-        self.world[y][x] = value
+        x -= self.origin[0]
+        y -= self.origin[1]
+        self.pixels[y * self.width + x] = 0
+        self.cells_alive[cell] = None
 
-    def get(self, cell):
+    def erase_cell(self, cell):
         x, y = cell
-        return self.world[y][x]
+        x -= self.origin[0]
+        y -= self.origin[1]
+        self.pixels[y * self.width + x] = 255
+        del self.cells_alive[cell]
+
+    def refresh(self):
+        header = b'P5 %d %d 255\n' % (self.width, self.height)
+        self.image.configure(data=header + bytes(self.pixels), format='PPM')
+        self.scaled.tk.call(self.scaled, 'copy', self.image,
+                            '-zoom', self.size, self.size)
+
+
+class DensityApplication(Application):
+    """Application that draws a zoomed out view of a large world.
+
+    The view is columns x rows pixels, each one a 2^level x 2^level
+    block of the world shaded by its number of live cells. The counts
+    are kept in a density.Pyramid that follows births and deaths, so
+    zooming (+ and - keys) and panning only render the pyramid again
+    and cost time per screen pixel, not per world cell.
+
+    """
+
+    def __init__(self, width, height, size=1, engine=None, library=None,
+                 rule=CONWAY, view=(800, 600)):
+        self.columns, self.rows = view
+        self.level = 0
+        while self.columns << self.level < width or \
+              self.rows << self.level < height:
+            self.level += 1
+        self.pyramid = Pyramid(max(width, height).bit_length() + 1)
+        Application.__init__(self, width, height, size, engine, library,
+                             rule)
+
+    def create_widgets(self):
+        Application.create_widgets(self)
+        self.canvas.config(width=self.columns * self.size,
+                           height=self.rows * self.size)
+        self.image = tk.PhotoImage(width=self.columns, height=self.rows)
+        self.scaled = tk.PhotoImage(width=self.columns * self.size,
+                                    height=self.rows * self.size)
+        self.canvas.create_image(0, 0, image=self.scaled, anchor=tk.NW)
+
+    def create_events(self):
+        Application.create_events(self)
+        self.canvas.bind_all('<plus>', lambda e: self.zoom(-1))
+        self.canvas.bind_all('<equal>', lambda e: self.zoom(-1))
+        self.canvas.bind_all('<minus>', lambda e: self.zoom(1))
+
+    def draw_grid(self):
+        pass
+
+    def clear_screen(self):
+        self.pyramid.clear()
+        self.cells_alive = self.pyramid.counts[0]
+        self.clear_highlights()
+        self.refresh()
+
+    def repaint(self):
+        """Rebuild the pyramid from every live cell of the engine."""
+        self.clear_screen()
+        if hasattr(self.life, 'live_cells'):
+            cells = self.life.live_cells(0, 0, self.width, self.height)
+        else:
+            cells = ((x, y) for y, row in enumerate(self.life.packed_rows())
+                            for x in bits(row))
+        for cell in cells:
+            self.paint_cell(cell)
+        self.refresh()
+
+    def paint_cell(self, cell):
+        self.pyramid.add(cell, 1)
+
+    def erase_cell(self, cell):
+        self.pyramid.add(cell, -1)
+
+    def visible(self, cell):
+        return True
+
+    def to_screen(self, cell):
+        x, y = cell
+        ox, oy = self.origin
+        return ((x - ox) >> self.level) * self.size, \
+               ((y - oy) >> self.level) * self.size
+
+    def to_world(self, x, y):
+        ox, oy = self.origin
+        return (ox + ((x // self.size) << self.level),
+                oy + ((y // self.size) << self.level))
+
+    def pan_step(self, dx, dy):
+        return (dx * (max(1, self.columns // 4) << self.level),
+                dy * (max(1, self.rows // 4) << self.level))
+
+    def pan(self, dx, dy):
+        block = 1 << self.level
+        self.origin = (self.origin[0] + dx // block * block,
+                       self.origin[1] + dy // block * block)
+        self.clear_highlights()
+        self.refresh()
+        if not self.running:
+            self.status.config(text = "View at %d, %d" % self.origin)
+
+    def zoom(self, delta):
+        """Zoom out (delta > 0) or in by powers of two, around the center."""
+        level = min(max(self.level + delta, 0), self.pyramid.levels - 1)
+        x, y = self.to_world(self.columns * self.size // 2,
+                             self.rows * self.size // 2)
+        self.level = level
+        self.origin = ((x - (self.columns << level) // 2) >> level << level,
+                       (y - (self.rows << level) // 2) >> level << level)
+        self.clear_highlights()
+        self.refresh()
+        if not self.running:
+            self.status.config(text = "Zoom 1:%d" % (1 << level))
+
+    def refresh(self):
+        pixels = self.pyramid.render(self.origin, self.level,
+                                     self.columns, self.rows)
+        header = b'P5 %d %d 255\n' % (self.columns, self.rows)
+        self.image.configure(data=header + bytes(pixels), format='PPM')
+        self.scaled.tk.call(self.scaled, 'copy', self.image,
+                            '-zoom', self.size, self.size)
+
+
+class RemoteApplication(Application):
+    """Application that views and drives the world of a server.py.
+
+    The server evolves the world; this window keeps a sparse copy of it
+    up to date from the server snapshot and diffs, and turns Run, Stop,
+    Clear, the rule and clicks on the board into commands. Several
+    windows, and scripts, can share one server.
+
+    """
+
+    def __init__(self, client, size=10, library=None):
+        self.client = client
+        snapshot = client.receive()
+        while snapshot['type'] != 'snapshot':
+            snapshot = client.receive()
+        engine = partial(SparseLife, torus=snapshot['torus'])
+        Application.__init__(self, snapshot['width'], snapshot['height'],
+                             size, engine, library, snapshot['rule'])
+        self.load(snapshot)
+        self.poll()
+
+    def create_widgets(self):
+        Application.create_widgets(self)
+        self.btn_clear.config(command=self.clear)
+
+    def load(self, snapshot):
+        """Replace the world with a snapshot of the server."""
+        self.rule = get_rule(snapshot['rule'])
+        names = dict((v, k) for k, v in RULES.items())
+        self.rule_name.set(names.get(str(self.rule), str(self.rule)))
+        self.life = Instrument(
+                self.engine(self.width, self.height, rule=self.rule))
+        self.life.set_many(pairs(snapshot['cells']), 1)
+        self.generation = snapshot['generation']
+        self.running = snapshot['running']
+        self.repaint()
+
+    def apply(self, diff):
+        births, deaths = pairs(diff['births']), pairs(diff['deaths'])
+        self.life.set_many(births, 1)
+        self.life.set_many(deaths, 0)
+        for cell in deaths:
+            if cell in self.cells_alive:
+                self.erase_cell(cell)
+        for cell in births:
+            if cell not in self.cells_alive and self.visible(cell):
+                self.paint_cell(cell)
+        self.generation = diff['generation']
+        self.running = diff['running']
+        self.record_frame()
+
+    def poll(self):
+        """Apply what the server sent since the last frame."""
+        skipped = 0
+        try:
+            for message in self.client.messages():
+                if message['type'] == 'snapshot':
+                    self.load(message)
+                elif message['type'] == 'diff':
+                    self.apply(message)
+                    skipped += message['skipped']
+                else:
+                    self.status.config(text = message['message'])
+        except (EOFError, OSError):
+            self.running = False
+            self.status.config(text = "Disconnected")
+            return
+        self.refresh()
+        if self.running:
+            self.clear_highlights()
+            self.status.config(text = "Generation %d, %d skipped" % (
+                self.generation, skipped))
+        self.job = self.after(1000 // FPS, self.poll)
+
+    def draw_cell(self, cell):
+        self.client.send('set', cells=list(cell), value=1)
+
+    def del_cell(self, cell):
+        self.client.send('set', cells=list(cell), value=0)
+
+    def place_pattern(self, cell, pattern, mode='or'):
+        self.client.send('place', x=cell[0], y=cell[1],
+                         pattern=[list(row) for row in pattern], mode=mode)
+
+    def run(self):
+        steps = self.steps.get()
+        self.client.send('run', steps=None if steps == 'forever' else
+                         int(steps), delay=float(self.sleep.get()))
+
+    def stop(self):
+        self.client.send('stop')
+
+    def clear(self):
+        self.client.send('clear')
+
+    def set_rule(self, name):
+        try:
+            rule = get_rule(name)
+        except ValueError as e:
+            self.status.config(text = str(e))
+            self.rule_name.set(str(self.rule))
+            return
+        self.client.send('rule', rule=str(rule))
 
 
 if __name__ == '__main__':
@@ -292,11 +903,113 @@ if __name__ == '__main__':
                       help="world width (default: 80)")
     parser.add_option('-H', '--height', type=int, default=40,
                       help="world height (default: 40)")
-    parser.add_option('-s', '--size', type=int, default=20,
-                      help="cell size (default: 20)")
+    parser.add_option('-s', '--size', type=int,
+                      help="cell size (default: 20, 1 with --density)")
+    parser.add_option('-e', '--engine', type='choice', default='python',
+                      choices=list(ENGINES.keys()),
+                      help="evolution engine: %s (default: python)" % \
+                           ', '.join(ENGINES.keys()))
+    parser.add_option('-i', '--image', action='store_true', default=False,
+                      help="render the world as one image, "
+                           "for large worlds")
+    parser.add_option('-d', '--density', action='store_true',
+                      default=False,
+                      help="draw the density of live cells, zoomed out, "
+                           "for worlds larger than the screen")
+    parser.add_option('--view', default='800x600', metavar='COLUMNSxROWS',
+                      help="pixels of the --density view (default: 800x600)")
+    parser.add_option('-P', '--patterns', metavar='DIR',
+                      help="directory of .rle, .lif and .cells patterns")
+    parser.add_option('-j', '--workers', type=int, default=None,
+                      help="worker processes for the parallel engine "
+                           "(default: one per core)")
+    parser.add_option('-c', '--checkpoint', metavar='FILE',
+                      help="save the world to FILE while running")
+    parser.add_option('--checkpoint-every', type=int,
+                      default=CHECKPOINT_EVERY, metavar='N',
+                      help="generations between checkpoints "
+                           "(default: %d)" % CHECKPOINT_EVERY)
+    parser.add_option('-r', '--resume', metavar='FILE',
+                      help="start from a checkpoint file")
+    parser.add_option('-R', '--rule', default='B3/S23',
+                      help="rule in B/S notation or one of: %s "
+                           "(default: B3/S23)" % ', '.join(RULES.keys()))
+    parser.add_option('--history', action='store_true', default=False,
+                      help="keep the generations of each run, to step "
+                           "back and forward with , and . (< and > by 10)")
+    parser.add_option('--connect', metavar='ADDRESS',
+                      help="view the world of a server.py at host:port "
+                           "or Unix socket path")
+    parser.add_option('--record', metavar='FILE',
+                      help="file of the Record button, an animated .gif "
+                           "or numbered .png files (default: "
+                           "life_<time>.gif)")
+    parser.add_option('--record-scale', type=int, metavar='N',
+                      help="pixels per cell of the recording "
+                           "(default: the cell size)")
+    parser.add_option('--record-stride', type=int, default=STRIDE,
+                      metavar='N',
+                      help="generations per recorded frame "
+                           "(default: %d)" % STRIDE)
+    parser.add_option('--record-delay', type=int, default=DELAY,
+                      metavar='MS',
+                      help="milliseconds per GIF frame "
+                           "(default: %d)" % DELAY)
+    parser.add_option('--profile', metavar='FILE',
+                      help="profile the session with cProfile into FILE")
     args, _ = parser.parse_args()
 
-    app = Application(args.width, args.height, args.size)
+    try:
+        rule = get_rule(args.rule)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.resume:
+        with Snapshot(args.resume) as snapshot:
+            args.width, args.height = snapshot.width, snapshot.height
+
+    engine = ENGINES[args.engine]
+    if args.engine == 'parallel':
+        engine = partial(engine, workers=args.workers)
+
+    library = PatternLibrary(args.patterns)
+    if args.connect:
+        try:
+            client = Client(args.connect)
+        except OSError as e:
+            parser.error("can not connect to %s: %s" % (args.connect, e))
+        app = RemoteApplication(client, args.size or 20, library)
+    elif args.density:
+        try:
+            columns, rows = (int(n) for n in args.view.split('x'))
+        except ValueError:
+            parser.error("invalid view: %s" % args.view)
+        app = DensityApplication(args.width, args.height, args.size or 1,
+                                 engine, library, rule, (columns, rows))
+    else:
+        cls = ImageApplication if args.image else Application
+        app = cls(args.width, args.height, args.size or 20, engine,
+                  library, rule)
+    app.checkpoint = args.checkpoint
+    app.checkpoint_every = args.checkpoint_every
+    app.keep_history = args.history
+    app.record = args.record
+    app.record_scale = args.record_scale
+    app.record_stride = args.record_stride
+    app.record_delay = args.record_delay
+    if args.resume:
+        try:
+            app.resume(args.resume)
+        except ValueError as e:
+            parser.error(str(e))
     app.master.title('Game of life')
-    app.mainloop()
-
+    if args.profile:
+        with profile(args.profile):
+            app.mainloop()
+    else:
+        app.mainloop()
+    app.stop_recording()
+    app.reset_history()
+
+    if hasattr(app.life, 'close'):
+        app.life.close()
@@ -0,0 +1,236 @@
+"""
+Author: Leo Vidarte <http://nerdlabs.com.ar>
+
+This is free software,
+you can redistribute it and/or modify it
+under the terms of the GPL version 3
+as published by the Free Software Foundation.
+
+"""
+
+"""
+Headless runner: evolves a pattern for a number of generations and
+prints the elapsed time and the final population. It never imports
+tkinter, so it can run on machines without a display.
+
+"""
+
+import json
+import sys
+import time
+from collections import Counter
+from functools import partial
+
+import formats
+from cycles import CycleDetector
+from engines import ENGINES
+from export import DELAY, STRIDE, Recorder
+from instrument import Instrument, profile
+from library import PatternLibrary
+from rules import RULES, get_rule
+from search import PatternIndex, find
+from snapshot import Snapshot, save
+
+
+CHECKPOINT_EVERY = 1000 # generations
+
+
+def run(life, generations, checkpoint=None, every=CHECKPOINT_EVERY,
+        generation=0, detector=None, recorder=None):
+    """Evolve life the given number of generations, return the seconds.
+
+    With a checkpoint path the world is saved there every `every`
+    generations and at the end, numbered from `generation`. With a
+    CycleDetector, once a cycle is found the whole periods left are
+    skipped and only the remainder is evolved. With an export.Recorder
+    every recorder.stride-th generation is recorded, and nothing is
+    skipped.
+
+    """
+    start = time.time()
+    done = 0
+    if recorder is not None:
+        recorder.frame(life, generation)
+    while done < generations:
+        n = min(generations - done, every) if checkpoint else \
+            generations - done
+        if recorder is not None:
+            n = min(n, recorder.stride - (generation + done) %
+                       recorder.stride)
+        if hasattr(life, 'advance'):
+            life.advance(n)
+            done += n
+        else:
+            for _ in range(n):
+                life.evolve()
+                done += 1
+                if detector is not None and detector.period is None and \
+                   detector.update(life) and recorder is None:
+                    for _ in range((generations - done) % detector.period):
+                        life.evolve()
+                    done = generations
+                    break
+        if checkpoint:
+            save(checkpoint, life, generation + done)
+        if recorder is not None:
+            recorder.frame(life, generation + done)
+    return time.time() - start
+
+
+if __name__ == '__main__':
+
+    from optparse import OptionParser
+    parser = OptionParser(description="Game of life, without display")
+    parser.add_option('-W', '--width', type=int, default=80,
+                      help="world width (default: 80)")
+    parser.add_option('-H', '--height', type=int, default=40,
+                      help="world height (default: 40)")
+    parser.add_option('-e', '--engine', type='choice', default='python',
+                      choices=list(ENGINES.keys()),
+                      help="evolution engine: %s (default: python)" % \
+                           ', '.join(ENGINES.keys()))
+    parser.add_option('-j', '--workers', type=int, default=None,
+                      help="worker processes for the parallel engine "
+                           "(default: one per core)")
+    parser.add_option('-p', '--pattern', default='Glider',
+                      help="name of a built-in pattern (default: Glider)")
+    parser.add_option('-P', '--patterns', metavar='DIR',
+                      help="directory of .rle, .lif and .cells patterns")
+    parser.add_option('-f', '--file',
+                      help="read the pattern from a .rle, .lif or .cells file")
+    parser.add_option('-x', type=int, default=None,
+                      help="pattern column (default: centered)")
+    parser.add_option('-y', type=int, default=None,
+                      help="pattern row (default: centered)")
+    parser.add_option('-n', '--generations', type=int, default=100,
+                      help="generations to run (default: 100)")
+    parser.add_option('--cycles', action='store_true', default=False,
+                      help="detect cycles and skip their repetitions")
+    parser.add_option('-c', '--checkpoint', metavar='FILE',
+                      help="save the world to FILE while running")
+    parser.add_option('--checkpoint-every', type=int,
+                      default=CHECKPOINT_EVERY, metavar='N',
+                      help="generations between checkpoints "
+                           "(default: %d)" % CHECKPOINT_EVERY)
+    parser.add_option('-r', '--resume', metavar='FILE',
+                      help="start from a checkpoint file")
+    parser.add_option('--stats', metavar='FILE',
+                      help="write per generation statistics to FILE "
+                           "as JSON lines")
+    parser.add_option('--find', action='append', metavar='NAME',
+                      help="count the occurrences of pattern NAME at the "
+                           "end, can be repeated")
+    parser.add_option('--record', metavar='FILE',
+                      help="record the run to an animated .gif, or to "
+                           "numbered .png files")
+    parser.add_option('--record-scale', type=int, default=1, metavar='N',
+                      help="pixels per cell of the recording (default: 1)")
+    parser.add_option('--record-stride', type=int, default=STRIDE,
+                      metavar='N',
+                      help="generations per recorded frame "
+                           "(default: %d)" % STRIDE)
+    parser.add_option('--record-delay', type=int, default=DELAY,
+                      metavar='MS',
+                      help="milliseconds per GIF frame "
+                           "(default: %d)" % DELAY)
+    parser.add_option('--profile', metavar='FILE',
+                      help="profile the run with cProfile into FILE")
+    parser.add_option('-R', '--rule', default='B3/S23',
+                      help="rule in B/S notation or one of: %s "
+                           "(default: B3/S23)" % ', '.join(RULES.keys()))
+    args, _ = parser.parse_args()
+
+    try:
+        rule = get_rule(args.rule)
+    except ValueError as e:
+        parser.error(str(e))
+
+    engine = ENGINES[args.engine]
+    if args.engine == 'parallel':
+        engine = partial(engine, workers=args.workers)
+
+    generation = 0
+    if args.resume:
+        with Snapshot(args.resume) as snapshot:
+            try:
+                life = snapshot.load(engine)
+            except ValueError as e:
+                parser.error(str(e))
+            generation = snapshot.generation
+    else:
+        library = PatternLibrary(args.patterns)
+        try:
+            if args.file:
+                pattern = formats.read(args.file)
+            else:
+                pattern = library.get(args.pattern)
+        except ValueError as e:
+            parser.error(str(e))
+        if pattern is None:
+            parser.error("unknown pattern: %s" % args.pattern)
+        try:
+            life = engine(args.width, args.height, rule=rule)
+        except ValueError as e:
+            parser.error(str(e))
+        x = args.x if args.x is not None else \
+            (args.width - len(pattern[0])) // 2
+        y = args.y if args.y is not None else \
+            (args.height - len(pattern)) // 2
+        life.place_pattern((x, y), pattern)
+
+    stats = None
+    if args.stats:
+        stats = open(args.stats, 'w')
+        life = Instrument(life)
+        life.subscribe(lambda record: stats.write(json.dumps(record) + '\n'))
+
+    recorder = None
+    if args.record:
+        try:
+            recorder = Recorder(args.record, life.width, life.height,
+                                args.record_scale, args.record_stride,
+                                args.record_delay)
+        except ValueError as e:
+            parser.error(str(e))
+
+    detector = CycleDetector(life) if args.cycles else None
+    try:
+        if args.profile:
+            with profile(args.profile):
+                seconds = run(life, args.generations, args.checkpoint,
+                              args.checkpoint_every, generation, detector,
+                              recorder)
+        else:
+            seconds = run(life, args.generations, args.checkpoint,
+                          args.checkpoint_every, generation, detector,
+                          recorder)
+        if recorder is not None:
+            recorder.close()
+    except OSError as e:
+        if hasattr(life, 'close'):
+            life.close()
+        sys.exit("error: %s" % e)
+    if stats is not None:
+        life.flush()
+        stats.close()
+    print("engine: %s, rule: %s" % (args.engine, life.rule))
+    print("generations: %d in %.3fs (%.1f gens/s)" % (
+          args.generations, seconds, args.generations / (seconds or 1e-9)))
+    print("population: %d" % life.population)
+    if detector is not None and detector.period is not None:
+        print("cycle: period %d from generation %d" % (
+              detector.period, generation + detector.start))
+    if recorder is not None:
+        print("recorded: %d frames to %s" % (recorder.frames, args.record))
+    if args.find:
+        library = PatternLibrary(args.patterns)
+        for name in args.find:
+            if library.get(name) is None:
+                parser.error("unknown pattern: %s" % name)
+        index = PatternIndex([(name, library[name]) for name in args.find],
+                             life.rule)
+        found = Counter(name for name, _, _, _, _ in find(life, index))
+        for name in args.find:
+            print("found: %s %d" % (name, found[name]))
+    if hasattr(life, 'close'):
+        life.close()
@@ -18,6 +18,8 @@ Las transiciones dependen del número de células vecinas vivas:
 
 """
 
+from rules import CONWAY
+
 # Glider
 board = [
     [0, 0, 0, 0, 0, 0, 0, 0],
@@ -58,9 +60,7 @@ def evolve(board):
             n = get_neighbors((x, y), board)
             t = n.count(1)
             # Born or survive
-            if (v == 0 and t == 3) or \
-               (v == 1 and t in (2, 3)):
-                board_[y][x] = 1
+            board_[y][x] = CONWAY.table[v][t]
     return board_
 
 def show(board):
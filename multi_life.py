@@ -0,0 +1,227 @@
+"""
+Author: Leo Vidarte <http://nerdlabs.com.ar>
+
+This is free software,
+you can redistribute it and/or modify it
+under the terms of the GPL version 3
+as published by the Free Software Foundation.
+
+"""
+
+import numpy as np
+
+from cycles import cell_key
+from rules import CONWAY, RULES, get_rule
+
+
+# Per world states
+RUNNING, DIED, CYCLED = 0, 1, 2
+STATES = ('running', 'died', 'cycled')
+
+
+class MultiLife(object):
+    """Many independent worlds of the same size evolved together.
+
+    The worlds are stacked in a single (count, height, width) array, so
+    one evolve() advances all of them with the same vectorized steps as
+    NumpyLife, wrapping around at the edges of each world.
+
+    A world stops when it dies out or repeats one of its last
+    max_period states (a still life is period 1), and it is masked out
+    of later generations. States are compared by a 64 bit hash of the
+    bit-packed world.
+
+    """
+
+    def __init__(self, count, width, height, rule=CONWAY, max_period=16):
+        self.count = count
+        self.width = width
+        self.height = height
+        self.rule = get_rule(rule)
+        self.max_period = max_period
+        self.worlds = np.zeros((count, height, width), dtype=np.uint8)
+        # One key per 64 bit word of a packed world
+        words = (height * ((width + 7) // 8) + 7) // 8
+        self.keys = np.array([cell_key((i, 0)) for i in range(words)],
+                             dtype=np.uint64)
+        self.generation = 0
+        self.state = np.zeros(count, dtype=np.uint8)
+        self.ended = np.full(count, -1, dtype=np.int64)
+        self.period = np.zeros(count, dtype=np.int64)
+        self.reset()
+
+    def reset(self):
+        """Start tracking from the current worlds, all running again."""
+        self.generation = 0
+        self.state[:] = RUNNING
+        self.ended[:] = -1
+        self.period[:] = 0
+        # Hashes of the last max_period generations, newest at column 0
+        self.seen = np.zeros((self.count, self.max_period), dtype=np.uint64)
+        self.seen[:, 0] = self.hashes(self.worlds)
+        self.filled = 1
+        self.finish(np.arange(self.count))
+
+    def randomize(self, density, seed=None):
+        """Fill every world at random, density can be one per world."""
+        rng = np.random.default_rng(seed)
+        density = np.broadcast_to(np.asarray(density, dtype=float),
+                                  (self.count,))
+        shape = (self.count, self.height, self.width)
+        self.worlds = (rng.random(shape) <
+                       density[:, None, None]).astype(np.uint8)
+        self.reset()
+
+    def hashes(self, worlds):
+        """A 64 bit hash of each world."""
+        packed = np.packbits(worlds, axis=2).reshape(len(worlds), -1)
+        pad = len(self.keys) * 8 - packed.shape[1]
+        if pad:
+            packed = np.pad(packed, ((0, 0), (0, pad)))
+        # splitmix64 of each word xor its key, like cell_key
+        z = packed.view(np.uint64) ^ self.keys
+        z ^= z >> np.uint64(30)
+        z *= np.uint64(0xbf58476d1ce4e5b9)
+        z ^= z >> np.uint64(27)
+        z *= np.uint64(0x94d049bb133111eb)
+        z ^= z >> np.uint64(31)
+        return np.bitwise_xor.reduce(z, axis=1)
+
+    def finish(self, index):
+        """Mark the worlds in index that died out, leave the rest."""
+        dead = index[self.worlds[index].reshape(len(index), -1).any(axis=1)
+                     == 0]
+        self.state[dead] = DIED
+        self.ended[dead] = self.generation
+        return dead
+
+    @property
+    def active(self):
+        return self.state == RUNNING
+
+    def evolve(self):
+        """Advance every running world one generation.
+
+        Returns the number of worlds still running.
+
+        """
+        index = np.flatnonzero(self.active)
+        if not len(index):
+            return 0
+        whole = len(index) == self.count
+        w = self.worlds if whole else self.worlds[index]
+        # Column sums of the 3x3 block, then add left and right columns
+        v = w + np.roll(w, 1, axis=1) + np.roll(w, -1, axis=1)
+        n = v + np.roll(v, 1, axis=2) + np.roll(v, -1, axis=2) - w
+        # Born or survive, one neighbor count at a time
+        born, survive = self.rule.table
+        alive = w.astype(bool)
+        dead = ~alive
+        w = np.zeros_like(w)
+        for c in range(9):
+            if born[c] and survive[c]:
+                w |= n == c
+            elif born[c]:
+                w |= (n == c) & dead
+            elif survive[c]:
+                w |= (n == c) & alive
+        if whole:
+            self.worlds = w
+        else:
+            self.worlds[index] = w
+        self.generation += 1
+
+        # Cycles, against the last max_period hashes of each world
+        h = self.hashes(w)
+        seen = self.seen[index]
+        match = seen[:, :self.filled] == h[:, None]
+        cycled = match.any(axis=1)
+        self.state[index[cycled]] = CYCLED
+        self.ended[index[cycled]] = self.generation
+        self.period[index[cycled]] = match[cycled].argmax(axis=1) + 1
+        seen[:, 1:] = seen[:, :-1]
+        seen[:, 0] = h
+        self.seen[index] = seen
+        self.filled = min(self.filled + 1, self.max_period)
+
+        self.finish(index[~cycled])
+        return int(np.count_nonzero(self.active))
+
+    def run(self, generations):
+        """Evolve until every world stopped or generations have passed."""
+        for _ in range(generations):
+            if not self.evolve():
+                break
+        return self.generation
+
+    @property
+    def population(self):
+        """Live cells of each world."""
+        return self.worlds.reshape(self.count, -1).sum(axis=1, dtype=np.int64)
+
+    def set(self, i, cell, value):
+        x, y = cell
+        self.worlds[i, y, x] = value
+
+    def get(self, i, cell):
+        x, y = cell
+        return int(self.worlds[i, y, x])
+
+    def packed_rows(self, i):
+        """Yield the rows of world i as packed ints."""
+        for row in np.packbits(self.worlds[i], axis=1, bitorder='little'):
+            yield int.from_bytes(row.tobytes(), 'little')
+
+    def summary(self):
+        """Count of worlds in each state."""
+        counts = np.bincount(self.state, minlength=len(STATES))
+        return dict(zip(STATES, counts.tolist()))
+
+
+if __name__ == '__main__':
+
+    import time
+    from optparse import OptionParser
+
+    parser = OptionParser(description="Sweep random soups over densities")
+    parser.add_option('-W', '--width', type=int, default=64,
+                      help="world width (default: 64)")
+    parser.add_option('-H', '--height', type=int, default=64,
+                      help="world height (default: 64)")
+    parser.add_option('-N', '--count', type=int, default=1000,
+                      help="worlds per density (default: 1000)")
+    parser.add_option('-d', '--density', action='append', type=float,
+                      help="initial density, can be repeated "
+                           "(default: 0.1 to 0.9)")
+    parser.add_option('-n', '--generations', type=int, default=1000,
+                      help="max generations (default: 1000)")
+    parser.add_option('-s', '--seed', type=int, help="random seed")
+    parser.add_option('-R', '--rule', default='B3/S23',
+                      help="rule in B/S notation or one of: %s "
+                           "(default: B3/S23)" % ', '.join(RULES.keys()))
+    args, _ = parser.parse_args()
+
+    try:
+        rule = get_rule(args.rule)
+    except ValueError as e:
+        parser.error(str(e))
+
+    densities = args.density or [i / 10.0 for i in range(1, 10)]
+    life = MultiLife(args.count * len(densities), args.width, args.height,
+                     rule=rule)
+    life.randomize(np.repeat(densities, args.count), seed=args.seed)
+    start = time.time()
+    life.run(args.generations)
+    elapsed = (time.time() - start) or 1e-9
+
+    print("worlds: %d of %dx%d, generations: %d in %.3fs" % (
+        life.count, args.width, args.height, life.generation, elapsed))
+    population = life.population
+    for k, density in enumerate(densities):
+        part = slice(k * args.count, (k + 1) * args.count)
+        counts = np.bincount(life.state[part], minlength=len(STATES))
+        ended = life.ended[part][life.state[part] != RUNNING]
+        print("density %.2f: %s, mean end %.1f, mean population %.1f" % (
+            density,
+            ', '.join('%s %d' % s for s in zip(STATES, counts.tolist())),
+            ended.mean() if len(ended) else 0, population[part].mean()))
@@ -0,0 +1,93 @@
+"""
+Author: Leo Vidarte <http://nerdlabs.com.ar>
+
+This is free software,
+you can redistribute it and/or modify it
+under the terms of the GPL version 3
+as published by the Free Software Foundation.
+
+"""
+
+from functools import partial
+
+import numpy as np
+
+from bit_life import Changes, Diffed
+from patterns import pattern_cells
+from rules import CONWAY, get_rule
+
+
+class NumpyLife(Diffed):
+    """Drop-in replacement for Life backed by a numpy array.
+
+    Neighbors are counted by summing rolled copies of the world,
+    so the toroidal wraparound of Life.get_neighbors is kept.
+
+    """
+
+    def __init__(self, width, height, rule=CONWAY):
+        self.width = width
+        self.height = height
+        self.rule = get_rule(rule)
+        self.world = np.zeros((height, width), dtype=np.uint8)
+        self.changes = Changes()
+
+    def evolve(self):
+        w = self.world
+        # Column sums of the 3x3 block, then add left and right columns
+        v = w + np.roll(w, 1, axis=0) + np.roll(w, -1, axis=0)
+        n = v + np.roll(v, 1, axis=1) + np.roll(v, -1, axis=1) - w
+        # Born or survive
+        table = np.array(self.rule.table, dtype=np.uint8)
+        self.world = table[w, n]
+        # set() changes the world in place, so diff against a copy
+        self.changes = Changes(partial(self._changes, w, self.world.copy()))
+        return self.world
+
+    @property
+    def population(self):
+        return int(self.world.sum())
+
+    @staticmethod
+    def _cells(mask):
+        ys, xs = np.nonzero(mask)
+        return list(zip(xs.tolist(), ys.tolist()))
+
+    @classmethod
+    def _changes(cls, old, new):
+        return cls._cells(new > old), cls._cells(new < old)
+
+    def set(self, cell, value):
+        x, y = cell
+        self.world[y, x] = value
+
+    def get(self, cell):
+        x, y = cell
+        return int(self.world[y, x])
+
+    def set_many(self, cells, value):
+        if cells:
+            xs, ys = np.array(cells).T
+            self.world[ys, xs] = value
+
+    def place_pattern(self, origin, pattern, mode='or'):
+        cells = pattern_cells(self, origin, pattern)
+        if mode not in ('or', 'xor', 'clear'):
+            raise ValueError("unknown mode: %s" % mode)
+        if not cells:
+            return
+        xs, ys = np.array(cells).T
+        if mode == 'xor':
+            self.world[ys, xs] ^= 1
+        else:
+            self.world[ys, xs] = mode == 'or'
+
+    def packed_rows(self):
+        for row in np.packbits(self.world, axis=1, bitorder='little'):
+            yield int.from_bytes(row.tobytes(), 'little')
+
+    def load_packed_rows(self, rows):
+        stride = (self.width + 7) // 8
+        for y, r in enumerate(rows):
+            row = np.frombuffer(r.to_bytes(stride, 'little'), dtype=np.uint8)
+            self.world[y] = np.unpackbits(row, bitorder='little')[:self.width]
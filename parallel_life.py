@@ -0,0 +1,177 @@
+"""
+Author: Leo Vidarte <http://nerdlabs.com.ar>
+
+This is free software,
+you can redistribute it and/or modify it
+under the terms of the GPL version 3
+as published by the Free Software Foundation.
+
+"""
+
+import os
+from functools import partial
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+from bit_life import (Changes, Diffed, apply_mask, block_changes,
+                      evolve_rows, row_masks)
+from patterns import pattern_cells
+from rules import CONWAY, get_rule
+
+
+# Worker state, set once per process by _init_worker
+_buffers = None
+_width = _height = _stride = 0
+
+
+def _init_worker(names, width, height):
+    global _buffers, _width, _height, _stride
+    _buffers = [SharedMemory(name=name) for name in names]
+    _width, _height = width, height
+    _stride = (width + 7) // 8
+
+
+def _rule(notation, cache={}):
+    if notation not in cache:
+        cache[notation] = get_rule(notation)
+    return cache[notation]
+
+
+def _read_row(buf, y):
+    start = (y % _height) * _stride
+    return int.from_bytes(buf[start:start + _stride], 'little')
+
+
+def _evolve_strip(args):
+    """Evolve rows [y0, y1) from buffer src into the other buffer.
+
+    Only the strip and its two halo rows are read from shared memory,
+    so nothing but the strip bounds and the rule crosses the process
+    boundary on the way in. The rows that changed come back as
+    (0, y, (old,), (new,)) blocks for bit_life.block_changes.
+
+    """
+    src, y0, y1, rule = args
+    buf = _buffers[src].buf
+    out = _buffers[1 - src].buf
+    rows = [_read_row(buf, y) for y in range(y0 - 1, y1 + 1)]
+    changed = []
+    for y, row in enumerate(evolve_rows(rows, _width, _rule(rule)), y0):
+        start = y * _stride
+        out[start:start + _stride] = row.to_bytes(_stride, 'little')
+        if row != rows[y - y0 + 1]:
+            changed.append((0, y, (rows[y - y0 + 1],), (row,)))
+    return changed
+
+
+class ParallelLife(Diffed):
+    """Life engine that evolves horizontal strips on a process pool.
+
+    The world is bit-packed into two shared memory buffers, one read
+    and one written per generation. Workers read the halo rows of the
+    neighboring strips straight from the shared buffer and wrap around
+    at the edges like Life.get_neighbors. Call close() to stop the
+    pool and release the shared memory.
+
+    """
+
+    def __init__(self, width, height, rule=CONWAY, workers=None):
+        self.width = width
+        self.height = height
+        self.rule = get_rule(rule)
+        self.workers = workers or os.cpu_count() or 1
+        self.stride = (width + 7) // 8
+        size = max(1, self.stride * height)
+        self.buffers = [SharedMemory(create=True, size=size)
+                        for _ in range(2)]
+        for shm in self.buffers:
+            shm.buf[:size] = bytes(size)
+        self.current = 0
+        self.changes = Changes()
+        self.pool = Pool(self.workers, _init_worker,
+                         ([shm.name for shm in self.buffers], width, height))
+        strips = min(self.workers, height) or 1
+        bounds = [height * i // strips for i in range(strips + 1)]
+        self.strips = list(zip(bounds, bounds[1:]))
+
+    def evolve(self):
+        rule = str(self.rule)
+        tasks = [(self.current, y0, y1, rule) for y0, y1 in self.strips]
+        # The workers diff their own strips, the buffers are reused
+        blocks = [block for changed in self.pool.map(_evolve_strip, tasks)
+                  for block in changed]
+        self.current = 1 - self.current
+        self.changes = Changes(partial(block_changes, blocks))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+            for shm in self.buffers:
+                shm.close()
+                shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _offset(self, cell):
+        x, y = cell
+        return y * self.stride + x // 8, 1 << (x % 8)
+
+    def set(self, cell, value):
+        buf = self.buffers[self.current].buf
+        i, bit = self._offset(cell)
+        if value:
+            buf[i] |= bit
+        else:
+            buf[i] &= ~bit & 0xff
+
+    def get(self, cell):
+        buf = self.buffers[self.current].buf
+        i, bit = self._offset(cell)
+        return 1 if buf[i] & bit else 0
+
+    def _apply(self, cells, mode):
+        buf = self.buffers[self.current].buf
+        stride = self.stride
+        for y, mask in row_masks(cells).items():
+            start = y * stride
+            row = int.from_bytes(buf[start:start + stride], 'little')
+            row = apply_mask(row, mask, mode)
+            buf[start:start + stride] = row.to_bytes(stride, 'little')
+
+    def set_many(self, cells, value):
+        self._apply(cells, 'or' if value else 'clear')
+
+    def place_pattern(self, origin, pattern, mode='or'):
+        self._apply(pattern_cells(self, origin, pattern), mode)
+
+    def packed_rows(self):
+        return iter(self.rows())
+
+    def load_packed_rows(self, rows):
+        buf = self.buffers[self.current].buf
+        stride = self.stride
+        for y, r in enumerate(rows):
+            buf[y * stride:(y + 1) * stride] = r.to_bytes(stride, 'little')
+
+    def rows(self):
+        """The current generation as a list of packed row ints."""
+        buf = self.buffers[self.current].buf
+        stride = self.stride
+        return [int.from_bytes(buf[y * stride:(y + 1) * stride], 'little')
+                for y in range(self.height)]
+
+    @property
+    def population(self):
+        return sum(bin(row).count('1') for row in self.rows())
+
+    @property
+    def world(self):
+        """The shared buffer unpacked into the Life.world layout."""
+        return [[(row >> x) & 1 for x in range(self.width)]
+                for row in self.rows()]
@@ -310,65 +310,162 @@ def rotate(pattern, direction=90):
     return tuple(new)
 
 
-
 from collections import OrderedDict
+from collections.abc import Mapping
+
+
+OFFSETS_CACHE = 256 # patterns whose offsets are kept
+
+# id(pattern) -> (pattern, offsets), most recently used last. The
+# pattern is kept so its id can not be reused while cached.
+_offsets = OrderedDict()
+
+
+def offsets(pattern):
+    """The (x, y) offsets of the live cells of pattern.
+
+    Each pattern object is only scanned once. The cache is keyed by
+    identity, so a lookup does not hash or compare the whole pattern.
+
+    """
+    key = id(pattern)
+    entry = _offsets.get(key)
+    if entry is not None and entry[0] is pattern:
+        _offsets.move_to_end(key)
+        return entry[1]
+    cells = tuple((x, y) for y, row in enumerate(pattern)
+                         for x, v in enumerate(row) if v == 1)
+    _offsets[key] = (pattern, cells)
+    if len(_offsets) > OFFSETS_CACHE:
+        _offsets.popitem(last=False)
+    return cells
+
+
+def pattern_cells(life, origin, pattern):
+    """The cells of pattern with its top left corner at origin.
+
+    They wrap around the edges of the world unless life is unbounded.
+
+    """
+    x0, y0 = origin
+    if getattr(life, 'torus', True):
+        w, h = life.width, life.height
+        return [((x0 + x) % w, (y0 + y) % h) for x, y in offsets(pattern)]
+    return [(x0 + x, y0 + y) for x, y in offsets(pattern)]
+
+
+def stamp(life, origin, pattern, mode='or'):
+    """Place pattern with set_many, for engines with no faster way.
+
+    mode 'or' sets the live cells of pattern, 'clear' kills them and
+    'xor' flips them.
+
+    """
+    cells = pattern_cells(life, origin, pattern)
+    if mode == 'or':
+        life.set_many(cells, 1)
+    elif mode == 'clear':
+        life.set_many(cells, 0)
+    elif mode == 'xor':
+        alive = [cell for cell in cells if life.get(cell)]
+        dead = [cell for cell in cells if not life.get(cell)]
+        life.set_many(alive, 0)
+        life.set_many(dead, 1)
+    else:
+        raise ValueError("unknown mode: %s" % mode)
+
+
+class Patterns(Mapping):
+    """The built-in patterns by name, in menu order.
+
+    Rotated variants are only built the first time they are looked up,
+    so importing the module does not build them. Section titles and
+    'One cell' are None.
+
+    """
+
+    def __init__(self, table):
+        # name -> (base pattern, rotation) or None
+        self.table = OrderedDict(table)
+        self.built = {}
+
+    def __getitem__(self, name):
+        entry = self.table[name]
+        if entry is None:
+            return None
+        pattern = self.built.get(name)
+        if pattern is None:
+            base, direction = entry
+            pattern = rotate(base, direction) if direction else base
+            self.built[name] = pattern
+        return pattern
+
+    def __iter__(self):
+        return iter(self.table)
+
+    def __len__(self):
+        return len(self.table)
+
+    def __contains__(self, name):
+        return name in self.table
+
 
-patterns = OrderedDict([
+patterns = Patterns([
     ('One cell', None),
     ('--- Spaceships ---', None),
-    ('Glider', _glider),
-    ('Glider (90)', rotate(_glider, 90)),
-    ('Glider (-90)', rotate(_glider, -90)),
-    ('Glider (-180)', rotate(_glider, 180)),
-    ('Lightweight spaceship', _lightweight_spaceship),
-    ('Lightweight spaceship (90)', rotate(_lightweight_spaceship, 90)),
-    ('Lightweight spaceship (-90)', rotate(_lightweight_spaceship, -90)),
-    ('Lightweight spaceship (180)', rotate(_lightweight_spaceship, 180)),
-    ('Weekender', _weekender),
-    ('Weekender (90)', rotate(_weekender, 90)),
-    ('Weekender (-90)', rotate(_weekender, -90)),
-    ('Weekender (180)', rotate(_weekender, 180)),
-    ('Dart', _dart),
-    ('Dart (90)', rotate(_dart, 90)),
-    ('Dart (-90)', rotate(_dart, -90)),
-    ('Dart (180)', rotate(_dart, 180)),
-    ('Tagalong nn', _tagalong_nn),
-    ('Tagalong nn (90)', rotate(_tagalong_nn, 90)),
-    ('Tagalong nn (-90)', rotate(_tagalong_nn, -90)),
-    ('Tagalong nn (180)', rotate(_tagalong_nn, 180)),
-    ('Spaceship 44P5H2V0', _spaceship_44p5h2v0),
-    ('Spaceship 44P5H2V0 (90)', rotate(_spaceship_44p5h2v0, 90)),
-    ('Spaceship 44P5H2V0 (-90)', rotate(_spaceship_44p5h2v0, -90)),
-    ('Spaceship 44P5H2V0 (180)', rotate(_spaceship_44p5h2v0, 180)),
-    ('Spaceship 70P5H2V0', _spaceship_70p5h2v0),
-    ('Spaceship 70P5H2V0 (90)', rotate(_spaceship_70p5h2v0, 90)),
-    ('Spaceship 70P5H2V0 (-90)', rotate(_spaceship_70p5h2v0, -90)),
-    ('Spaceship 70P5H2V0 (180)', rotate(_spaceship_70p5h2v0, 180)),
+    ('Glider', (_glider, 0)),
+    ('Glider (90)', (_glider, 90)),
+    ('Glider (-90)', (_glider, -90)),
+    ('Glider (-180)', (_glider, 180)),
+    ('Lightweight spaceship', (_lightweight_spaceship, 0)),
+    ('Lightweight spaceship (90)', (_lightweight_spaceship, 90)),
+    ('Lightweight spaceship (-90)', (_lightweight_spaceship, -90)),
+    ('Lightweight spaceship (180)', (_lightweight_spaceship, 180)),
+    ('Weekender', (_weekender, 0)),
+    ('Weekender (90)', (_weekender, 90)),
+    ('Weekender (-90)', (_weekender, -90)),
+    ('Weekender (180)', (_weekender, 180)),
+    ('Dart', (_dart, 0)),
+    ('Dart (90)', (_dart, 90)),
+    ('Dart (-90)', (_dart, -90)),
+    ('Dart (180)', (_dart, 180)),
+    ('Tagalong nn', (_tagalong_nn, 0)),
+    ('Tagalong nn (90)', (_tagalong_nn, 90)),
+    ('Tagalong nn (-90)', (_tagalong_nn, -90)),
+    ('Tagalong nn (180)', (_tagalong_nn, 180)),
+    ('Spaceship 44P5H2V0', (_spaceship_44p5h2v0, 0)),
+    ('Spaceship 44P5H2V0 (90)', (_spaceship_44p5h2v0, 90)),
+    ('Spaceship 44P5H2V0 (-90)', (_spaceship_44p5h2v0, -90)),
+    ('Spaceship 44P5H2V0 (180)', (_spaceship_44p5h2v0, 180)),
+    ('Spaceship 70P5H2V0', (_spaceship_70p5h2v0, 0)),
+    ('Spaceship 70P5H2V0 (90)', (_spaceship_70p5h2v0, 90)),
+    ('Spaceship 70P5H2V0 (-90)', (_spaceship_70p5h2v0, -90)),
+    ('Spaceship 70P5H2V0 (180)', (_spaceship_70p5h2v0, 180)),
     ('--- Oscilators ---', None),
-    ('Blinker, period 2', _blinker_period_2),
-    ('Toad, period 2', _toad_period_2),
-    ('Beacon, period 2', _beacon_period_2),
-    ('Star, period 3', _star_period_3),
-    ('Cross, period 3', _cross_period_3),
-    ('French kiss, period 3', _french_kiss_period_3),
-    ('French kiss, period 3 (90)', rotate(_french_kiss_period_3, 90)),
-    ('Clock 2, period 4', _clock_2_period_4),
-    ('Pinwhell, period 4', _pinwheel_period_4),
-    ('Octagon, period 5', _octagon_period_5),
-    ('Fumarole, period 5', _fumarole_period_5),
-    ('Fumarole, period 5 (90)', rotate(_fumarole_period_5, 90)),
-    ('Fumarole, period 5 (-90)', rotate(_fumarole_period_5, -90)),
-    ('Fumarole, period 5 (180)', rotate(_fumarole_period_5, 180)),
-    ('Pentoad, period 5', _pentoad_period_5),
-    ('Pentoad, period 5 (90)', rotate(_pentoad_period_5, 90)),
-    ('Kok\'s galaxy, period 8', _koks_galaxy_period_8),
-    ('Pentadecathlon, period 15', _pentadecathlon_period_5),
-    ('Pentadecathlon, period 15 (90)', rotate(_pentadecathlon_period_5, 90)),
+    ('Blinker, period 2', (_blinker_period_2, 0)),
+    ('Toad, period 2', (_toad_period_2, 0)),
+    ('Beacon, period 2', (_beacon_period_2, 0)),
+    ('Star, period 3', (_star_period_3, 0)),
+    ('Cross, period 3', (_cross_period_3, 0)),
+    ('French kiss, period 3', (_french_kiss_period_3, 0)),
+    ('French kiss, period 3 (90)', (_french_kiss_period_3, 90)),
+    ('Clock 2, period 4', (_clock_2_period_4, 0)),
+    ('Pinwhell, period 4', (_pinwheel_period_4, 0)),
+    ('Octagon, period 5', (_octagon_period_5, 0)),
+    ('Fumarole, period 5', (_fumarole_period_5, 0)),
+    ('Fumarole, period 5 (90)', (_fumarole_period_5, 90)),
+    ('Fumarole, period 5 (-90)', (_fumarole_period_5, -90)),
+    ('Fumarole, period 5 (180)', (_fumarole_period_5, 180)),
+    ('Pentoad, period 5', (_pentoad_period_5, 0)),
+    ('Pentoad, period 5 (90)', (_pentoad_period_5, 90)),
+    ('Kok\'s galaxy, period 8', (_koks_galaxy_period_8, 0)),
+    ('Pentadecathlon, period 15', (_pentadecathlon_period_5, 0)),
+    ('Pentadecathlon, period 15 (90)', (_pentadecathlon_period_5, 90)),
     ('--- Still lives ---', None),
-    ('Block', _block),
-    ('Boat', _boat),
-    ('Beehive', _beehive),
-    ('Loaf', _loaf),
+    ('Block', (_block, 0)),
+    ('Boat', (_boat, 0)),
+    ('Beehive', (_beehive, 0)),
+    ('Loaf', (_loaf, 0)),
     ('--- Guns ---', None),
-    ('Gosper glider gun', _gosper_glider_gun),
+    ('Gosper glider gun', (_gosper_glider_gun, 0)),
     ])
@@ -0,0 +1,100 @@
+"""
+Author: Leo Vidarte <http://nerdlabs.com.ar>
+
+This is free software,
+you can redistribute it and/or modify it
+under the terms of the GPL version 3
+as published by the Free Software Foundation.
+
+"""
+
+import re
+from collections import OrderedDict
+
+
+RULES = OrderedDict([
+    ('Life', 'B3/S23'),
+    ('HighLife', 'B36/S23'),
+    ('Seeds', 'B2/S'),
+    ('Day & Night', 'B3678/S34678'),
+    ('Life without death', 'B3/S012345678'),
+    ('Maze', 'B3/S12345'),
+    ('2x2', 'B36/S125'),
+    ])
+
+NOTATION = re.compile(r'^B([0-8]*)/S([0-8]*)$', re.IGNORECASE)
+LEGACY = re.compile(r'^([0-8]*)/([0-8]*)$')
+
+
+class Rule(object):
+    """A Life-like rule in B/S notation, such as 'B3/S23'.
+
+    The rule is compiled once into table, indexed by the cell state and
+    the number of live neighbors (table[v][t] is the next state), and
+    into the 512 entry neighborhood table, indexed by the 3x3 block
+    around a cell read as bits (bit 4 is the cell itself).
+
+    """
+
+    def __init__(self, notation='B3/S23'):
+        if isinstance(notation, Rule):
+            notation = str(notation)
+        notation = notation.strip()
+        m = NOTATION.match(notation)
+        if m:
+            born, survive = m.groups()
+        else:
+            # Legacy S/B notation, as in '23/3'
+            m = LEGACY.match(notation)
+            if not m:
+                raise ValueError("invalid rule: %s" % notation)
+            survive, born = m.groups()
+        self.born = frozenset(int(c) for c in born)
+        self.survive = frozenset(int(c) for c in survive)
+        self.table = (
+            tuple(1 if t in self.born else 0 for t in range(9)),
+            tuple(1 if t in self.survive else 0 for t in range(9)),
+            )
+        self.neighborhood = tuple(
+            self.table[(i >> 4) & 1][bin(i & ~16).count('1')]
+            for i in range(512))
+
+    def __str__(self):
+        return 'B%s/S%s' % (''.join(map(str, sorted(self.born))),
+                            ''.join(map(str, sorted(self.survive))))
+
+    def __repr__(self):
+        return 'Rule(%r)' % str(self)
+
+    def __eq__(self, other):
+        return isinstance(other, Rule) and \
+            (self.born, self.survive) == (other.born, other.survive)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.born, self.survive))
+
+
+CONWAY = Rule('B3/S23')
+
+
+def get_rule(name):
+    """A Rule from a Rule, a name in RULES or B/S notation."""
+    if isinstance(name, Rule):
+        return name
+    return Rule(RULES.get(name, name))
+
+
+def require_no_b0(name):
+    """get_rule(name), or ValueError if cells are born with no neighbors.
+
+    Engines that only visit the live cells and their neighbors can not
+    run B0 rules, since every empty cell of the plane would change.
+
+    """
+    rule = get_rule(name)
+    if rule.table[0][0]:
+        raise ValueError("B0 rules are not supported: %s" % rule)
+    return rule
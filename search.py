@@ -0,0 +1,135 @@
+"""
+Author: Leo Vidarte <http://nerdlabs.com.ar>
+
+This is free software,
+you can redistribute it and/or modify it
+under the terms of the GPL version 3
+as published by the Free Software Foundation.
+
+"""
+
+"""
+Finds every occurrence of known objects in a world. Each object is
+compiled once into all of its orientations and phases; a match is the
+object with a border of dead cells around it, so a block inside a
+bigger blob is not found. Objects that emit others, like guns, are
+matched by their phases within their own bounding box, and the border
+is not checked where the emitted objects leave.
+
+"""
+
+from census import MAX_PERIOD, cropped_phases, orientations, phases
+from rules import CONWAY, get_rule
+
+
+class PatternIndex(object):
+    """Every orientation and phase of some named patterns.
+
+    Each variant is kept as a list of (row, column, alive) checks over
+    its bounding box plus a dead border, live cells first. Shapes
+    shared by several names keep the first one, so 'Glider' wins over
+    'Glider (90)'.
+
+    """
+
+    def __init__(self, patterns, rule=CONWAY, max_period=MAX_PERIOD):
+        rule = get_rule(rule)
+        names = {}
+        for name, pattern in patterns:
+            if pattern is None:
+                continue
+            for p in orientations(pattern):
+                cells = [(x, y) for y, row in enumerate(p)
+                                for x, v in enumerate(row) if v == 1]
+                if not cells:
+                    continue
+                shapes, period = phases(cells, rule, max_period)
+                if period:
+                    for s in shapes:
+                        names.setdefault((s, None), (name, ()))
+                    continue
+                crops, period, box, ring = cropped_phases(cells, rule,
+                                                          max_period)
+                if not period:
+                    names.setdefault((shapes[0], None), (name, ()))
+                    continue
+                for s in crops:
+                    names.setdefault((s, box), (name, ring))
+        self.variants = [(name,) + self.compile(s, box, ring)
+                         for (s, box), (name, ring) in names.items()]
+
+    @staticmethod
+    def compile(s, box=None, ring=()):
+        """(width, height, checks) of shape s, or of s within box.
+
+        The cells of ring are left out of the dead border.
+
+        """
+        if box is None:
+            box = (max(x for x, _ in s) + 1, max(y for _, y in s) + 1)
+        width, height = box
+        checks = [(y + 1, x + 1, True) for x, y in sorted(s)]
+        checks.extend((y, x, False) for y in range(height + 2)
+                                    for x in range(width + 2)
+                                    if (x - 1, y - 1) not in s and
+                                       (x - 1, y - 1) not in ring)
+        return width, height, checks
+
+    def names(self):
+        return sorted(set(v[0] for v in self.variants))
+
+
+def find(life, index, origin=(0, 0)):
+    """Yield (name, x, y, width, height) for every match in life.
+
+    x, y is the top left corner of the match. All the variants are
+    checked against whole packed rows at once, one bitwise operation
+    per cell of the variant and row of the world, so a search costs
+    about one scan of the board per variant. Matches wrap around the
+    edges of a torus; unbounded engines are searched within the width
+    x height region at origin.
+
+    """
+    w, h = life.width, life.height
+    torus = getattr(life, 'torus', True)
+    ox, oy = (0, 0) if torus else origin
+    if (ox, oy) == (0, 0):
+        rows = list(life.packed_rows())
+    else:
+        rows = [0] * h
+        for x, y in life.live_cells(ox, oy, ox + w, oy + h):
+            rows[y - oy] |= 1 << (x - ox)
+    if not rows or not index.variants:
+        return
+    pad = max(max(v[1], v[2]) for v in index.variants) + 2
+    # Bit x + 1 of ext[y + 1] is the cell (x, y), with the dead or
+    # wrapped around cells of the borders
+    if torus:
+        mask = (1 << (w + pad)) - 1
+        ext = [((r | (r << w) | (r << 2 * w)) >> (w - 1)) & mask
+               for r in rows]
+        ext = ext[-1:] + ext + (ext * (pad // h + 1))[:pad]
+    else:
+        ext = [0] + [r << 1 for r in rows] + [0] * pad
+    shifted = {}
+    for name, width, height, checks in index.variants:
+        if width > w or height > h:
+            continue
+        if torus:
+            full, last = (1 << w) - 1, h
+        else:
+            full, last = (1 << (w - width + 1)) - 1, h - height + 1
+        for i in set(c[1] for c in checks):
+            if i not in shifted:
+                shifted[i] = [r >> i for r in ext]
+        for y in range(last):
+            m = full
+            for j, i, alive in checks:
+                r = shifted[i][y + j]
+                m &= r if alive else ~r
+                if not m:
+                    break
+            while m:
+                low = m & -m
+                yield name, ox + low.bit_length() - 1, oy + y, width, height
+                m ^= low
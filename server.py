@@ -0,0 +1,412 @@
+"""
+Author: Leo Vidarte <http://nerdlabs.com.ar>
+
+This is free software,
+you can redistribute it and/or modify it
+under the terms of the GPL version 3
+as published by the Free Software Foundation.
+
+"""
+
+"""
+Simulation server: one process owns the engine and streams it to any
+number of viewers over a local TCP or Unix socket.
+
+Messages are JSON lines both ways, cells are flat [x0, y0, x1, y1, ...]
+lists. A viewer first gets a snapshot:
+
+    {"type": "snapshot", "generation": 0, "width": 80, "height": 40,
+     "rule": "B3/S23", "torus": true, "running": false, "cells": [...]}
+
+and then one diff per generation:
+
+    {"type": "diff", "generation": 1, "running": true, "skipped": 0,
+     "births": [...], "deaths": [...]}
+
+A viewer that can not keep up gets the changes of several generations
+merged into one diff, and skipped tells how many generations it
+missed. Viewers send commands:
+
+    {"cmd": "run", "steps": 100, "delay": 0.01}   steps null for ever
+    {"cmd": "stop"}
+    {"cmd": "set", "cells": [...], "value": 1}
+    {"cmd": "place", "x": 0, "y": 0, "pattern": [[0, 1], ...],
+     "mode": "or"}
+    {"cmd": "clear"}
+    {"cmd": "rule", "rule": "B36/S23"}
+
+"""
+
+import asyncio
+import json
+import os
+import select
+import socket
+
+from bit_life import bits
+from patterns import pattern_cells
+from rules import get_rule
+
+
+ADDRESS = 'localhost:7777'
+LIMIT = 64 * 1024 # bytes buffered for a viewer before frames are skipped
+
+
+def parse_address(address):
+    """(host, port) for host:port, or the path of a Unix socket."""
+    host, _, port = address.rpartition(':')
+    if port.isdigit():
+        return host or 'localhost', int(port)
+    return address
+
+
+def flat(cells):
+    return [int(v) for cell in cells for v in cell]
+
+
+def pairs(values):
+    return list(zip(values[::2], values[1::2]))
+
+
+class Viewer(object):
+    """A connected client and the changes it has not been sent yet."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.pending = set()
+        self.snapshot = True
+        self.generation = 0
+        self.wake = asyncio.Event()
+        self.wake.set()
+
+
+class Server(object):
+    """Evolves life and streams it to every connected viewer.
+
+    Each viewer is fed by its own task: the changes of every generation
+    are added to the cells it is owed, and the task sends them as one
+    diff whenever its socket has drained below limit bytes. A slow
+    viewer thus gets fewer, bigger diffs, or a snapshot when the diff
+    would be bigger than the world, and never slows down the others.
+
+    """
+
+    def __init__(self, life, limit=LIMIT):
+        self.life = life
+        self.limit = limit
+        self.generation = 0
+        self.viewers = set()
+        self.job = None
+        self.cells = set(self.live_cells())
+
+    @property
+    def torus(self):
+        return getattr(self.life, 'torus', True)
+
+    def live_cells(self):
+        if hasattr(self.life, 'live_cells'):
+            return self.life.live_cells(0, 0, self.life.width,
+                                        self.life.height)
+        return ((x, y) for y, row in enumerate(self.life.packed_rows())
+                       for x in bits(row))
+
+    async def serve(self, address):
+        address = parse_address(address)
+        if isinstance(address, tuple):
+            server = await asyncio.start_server(self.handle, *address)
+        else:
+            server = await asyncio.start_unix_server(self.handle, address)
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader, writer):
+        writer.transport.set_write_buffer_limits(self.limit)
+        viewer = Viewer(writer)
+        self.viewers.add(viewer)
+        feed = asyncio.ensure_future(self.feed(viewer))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    self.command(json.loads(line))
+                except (ValueError, KeyError, TypeError) as e:
+                    writer.write(self.encode({'type': 'error',
+                                              'message': str(e)}))
+        except ConnectionError:
+            pass
+        finally:
+            self.viewers.discard(viewer)
+            feed.cancel()
+            writer.close()
+
+    async def feed(self, viewer):
+        try:
+            while True:
+                await viewer.wake.wait()
+                viewer.wake.clear()
+                viewer.writer.write(self.message(viewer))
+                await viewer.writer.drain()
+        except ConnectionError:
+            pass
+
+    @staticmethod
+    def encode(message):
+        return (json.dumps(message, separators=(',', ':')) +
+                '\n').encode('ascii')
+
+    def message(self, viewer):
+        """The snapshot or diff that brings viewer up to date."""
+        skipped = max(0, self.generation - viewer.generation - 1)
+        viewer.generation = self.generation
+        if viewer.snapshot or len(viewer.pending) > len(self.cells):
+            viewer.snapshot = False
+            viewer.pending.clear()
+            return self.encode({
+                'type': 'snapshot',
+                'generation': self.generation,
+                'width': self.life.width,
+                'height': self.life.height,
+                'rule': str(self.life.rule),
+                'torus': self.torus,
+                'running': self.job is not None,
+                'cells': flat(self.cells),
+            })
+        births = [c for c in viewer.pending if c in self.cells]
+        deaths = [c for c in viewer.pending if c not in self.cells]
+        viewer.pending.clear()
+        return self.encode({
+            'type': 'diff',
+            'generation': self.generation,
+            'running': self.job is not None,
+            'skipped': skipped,
+            'births': flat(births),
+            'deaths': flat(deaths),
+        })
+
+    def changed(self, cells):
+        """Owe every viewer cells, the cells that flipped."""
+        for viewer in self.viewers:
+            viewer.pending.symmetric_difference_update(cells)
+            viewer.wake.set()
+
+    def update(self, cells):
+        """Sync cells with the engine after a command and tell viewers."""
+        flipped = set(c for c in cells
+                      if (c in self.cells) != bool(self.life.get(c)))
+        self.cells.symmetric_difference_update(flipped)
+        self.changed(flipped)
+
+    # --------
+    # Commands
+    # --------
+
+    def command(self, message):
+        cmd = message['cmd']
+        if cmd == 'run':
+            self.run(message.get('steps'), message.get('delay', 0))
+        elif cmd == 'stop':
+            self.stop()
+        elif cmd == 'set':
+            self.set_many(pairs(message['cells']), message['value'])
+        elif cmd == 'place':
+            pattern = tuple(tuple(row) for row in message['pattern'])
+            self.place_pattern((message['x'], message['y']), pattern,
+                               message.get('mode', 'or'))
+        elif cmd == 'clear':
+            self.clear()
+        elif cmd == 'rule':
+            self.set_rule(message['rule'])
+        else:
+            raise ValueError("unknown command: %s" % cmd)
+
+    def run(self, steps=None, delay=0):
+        if self.job is None:
+            self.job = asyncio.ensure_future(self._run(steps, delay))
+
+    async def _run(self, steps, delay):
+        try:
+            while self.cells and (steps is None or steps > 0):
+                self.life.evolve()
+                self.generation += 1
+                births, deaths = self.life.births, self.life.deaths
+                self.cells.update(births)
+                self.cells.difference_update(deaths)
+                self.changed(births)
+                self.changed(deaths)
+                if steps is not None:
+                    steps -= 1
+                # Let the viewers and commands in between generations
+                await asyncio.sleep(delay)
+        finally:
+            self.job = None
+            self.changed(())
+
+    def stop(self):
+        if self.job is not None:
+            self.job.cancel()
+
+    def set_many(self, cells, value):
+        if self.torus:
+            w, h = self.life.width, self.life.height
+            cells = [(x % w, y % h) for x, y in cells]
+        self.life.set_many(cells, value)
+        self.update(cells)
+
+    def place_pattern(self, origin, pattern, mode='or'):
+        self.life.place_pattern(origin, pattern, mode)
+        self.update(pattern_cells(self.life, origin, pattern))
+
+    def clear(self):
+        self.stop()
+        cells = list(self.cells)
+        self.life.set_many(cells, 0)
+        self.update(cells)
+
+    def set_rule(self, rule):
+        self.life.rule = get_rule(rule)
+        for viewer in self.viewers:
+            viewer.snapshot = True
+            viewer.wake.set()
+
+
+class Client(object):
+    """A blocking connection to a server, for viewers and scripts."""
+
+    def __init__(self, address=ADDRESS):
+        address = parse_address(address)
+        if isinstance(address, tuple):
+            self.sock = socket.create_connection(address)
+        else:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(address)
+        self.buffer = b''
+
+    def send(self, cmd, **args):
+        args['cmd'] = cmd
+        self.sock.sendall(Server.encode(args))
+
+    def receive(self, timeout=None):
+        """The next message, or None if none came within timeout.
+
+        Raises EOFError once the server has closed the connection.
+
+        """
+        while b'\n' not in self.buffer:
+            ready, _, _ = select.select([self.sock], [], [], timeout)
+            if not ready:
+                return None
+            data = self.sock.recv(LIMIT)
+            if not data:
+                raise EOFError("connection closed by the server")
+            self.buffer += data
+        line, self.buffer = self.buffer.split(b'\n', 1)
+        return json.loads(line)
+
+    def messages(self):
+        """Yield the messages already received, without blocking."""
+        while True:
+            message = self.receive(0)
+            if message is None:
+                return
+            yield message
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == '__main__':
+
+    from functools import partial
+    from optparse import OptionParser
+
+    import formats
+    from engines import ENGINES
+    from library import PatternLibrary
+    from rules import RULES
+    from snapshot import Snapshot
+
+    parser = OptionParser(description="Serve a game of life to viewers")
+    parser.add_option('-W', '--width', type=int, default=80,
+                      help="world width (default: 80)")
+    parser.add_option('-H', '--height', type=int, default=40,
+                      help="world height (default: 40)")
+    parser.add_option('-e', '--engine', type='choice', default='python',
+                      choices=list(ENGINES.keys()),
+                      help="evolution engine: %s (default: python)" % \
+                           ', '.join(ENGINES.keys()))
+    parser.add_option('-j', '--workers', type=int, default=None,
+                      help="worker processes for the parallel engine "
+                           "(default: one per core)")
+    parser.add_option('-p', '--pattern',
+                      help="name of a built-in pattern to start with")
+    parser.add_option('-P', '--patterns', metavar='DIR',
+                      help="directory of .rle, .lif and .cells patterns")
+    parser.add_option('-f', '--file',
+                      help="read the pattern from a .rle, .lif or .cells file")
+    parser.add_option('-r', '--resume', metavar='FILE',
+                      help="start from a checkpoint file")
+    parser.add_option('-l', '--listen', default=ADDRESS, metavar='ADDRESS',
+                      help="host:port or Unix socket path to listen on "
+                           "(default: %s)" % ADDRESS)
+    parser.add_option('-R', '--rule', default='B3/S23',
+                      help="rule in B/S notation or one of: %s "
+                           "(default: B3/S23)" % ', '.join(RULES.keys()))
+    args, _ = parser.parse_args()
+
+    try:
+        rule = get_rule(args.rule)
+    except ValueError as e:
+        parser.error(str(e))
+
+    engine = ENGINES[args.engine]
+    if args.engine == 'parallel':
+        engine = partial(engine, workers=args.workers)
+
+    generation = 0
+    if args.resume:
+        with Snapshot(args.resume) as snapshot:
+            try:
+                life = snapshot.load(engine)
+            except ValueError as e:
+                parser.error(str(e))
+            generation = snapshot.generation
+    else:
+        try:
+            life = engine(args.width, args.height, rule=rule)
+        except ValueError as e:
+            parser.error(str(e))
+        pattern = None
+        try:
+            if args.file:
+                pattern = formats.read(args.file)
+            elif args.pattern:
+                pattern = PatternLibrary(args.patterns).get(args.pattern)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.pattern and not args.file and pattern is None:
+            parser.error("unknown pattern: %s" % args.pattern)
+        if pattern is not None:
+            life.place_pattern(((args.width - len(pattern[0])) // 2,
+                                (args.height - len(pattern)) // 2), pattern)
+
+    server = Server(life)
+    server.generation = generation
+    address = parse_address(args.listen)
+    print("serving %dx%d on %s" % (life.width, life.height, args.listen))
+    try:
+        asyncio.run(server.serve(args.listen))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if not isinstance(address, tuple) and os.path.exists(address):
+            os.remove(address)
+        if hasattr(life, 'close'):
+            life.close()
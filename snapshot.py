@@ -0,0 +1,187 @@
+"""
+Author: Leo Vidarte <http://nerdlabs.com.ar>
+
+This is free software,
+you can redistribute it and/or modify it
+under the terms of the GPL version 3
+as published by the Free Software Foundation.
+
+"""
+
+"""
+Binary world checkpoints.
+
+A checkpoint is a fixed header (magic, version, width, height,
+generation and rule), the number of blocks and the blocks. A block is
+its position and size (x0, y0, columns, rows) followed by its cells,
+one bit per cell, row by row. Each row takes (columns + 7) // 8 bytes
+and bit x of a row, read as a little endian int, is the cell at
+column x0 + x.
+
+A torus is saved as one block, the whole world, streamed to and from
+the engines through packed_rows() and load_packed_rows(). An
+unbounded plane is saved as one block per CHUNK x CHUNK square with
+live cells, cropped to them, so the file grows with the live cells
+and not with the area they are spread over.
+
+"""
+
+import mmap
+import os
+import struct
+
+
+MAGIC = b'LIFE'
+VERSION = 3
+HEADER = struct.Struct('<4sHIIQH')
+COUNT = struct.Struct('<Q') # blocks, since version 3
+BLOCK = struct.Struct('<qqII') # x0, y0, columns, rows, since version 2
+PLANE = (-(1 << 62), -(1 << 62), 1 << 62, 1 << 62)
+CHUNK = 64 # cells per side of the squares of an unbounded plane
+
+
+def blocks(life):
+    """Yield the (x0, y0, columns, rows) blocks of life and their rows."""
+    if getattr(life, 'torus', True):
+        yield (0, 0, life.width, life.height), life.packed_rows()
+        return
+    chunks = {}
+    for x, y in life.live_cells(*PLANE):
+        cx, x = divmod(x, CHUNK)
+        cy, y = divmod(y, CHUNK)
+        rows = chunks.get((cx, cy))
+        if rows is None:
+            rows = chunks[(cx, cy)] = [0] * CHUNK
+        rows[y] |= 1 << x
+    for c in sorted(chunks):
+        rows = chunks.pop(c)
+        top = next(y for y, r in enumerate(rows) if r)
+        bottom = CHUNK - next(y for y, r in enumerate(reversed(rows)) if r)
+        rows = rows[top:bottom]
+        left = min((r & -r).bit_length() - 1 for r in rows if r)
+        columns = max(r.bit_length() for r in rows) - left
+        yield ((c[0] * CHUNK + left, c[1] * CHUNK + top, columns,
+                len(rows)), [r >> left for r in rows])
+
+
+def save(path, life, generation=0):
+    """Write a checkpoint of life, replacing path atomically."""
+    rule = str(life.rule).encode('ascii')
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, life.width, life.height,
+                            generation, len(rule)))
+        f.write(rule)
+        where = f.tell()
+        f.write(COUNT.pack(0))
+        count = 0
+        for (x0, y0, columns, height), rows in blocks(life):
+            stride = (columns + 7) // 8
+            f.write(BLOCK.pack(x0, y0, columns, height))
+            for row in rows:
+                f.write(row.to_bytes(stride, 'little'))
+            count += 1
+        # The number of blocks is only known once they are written
+        f.seek(where)
+        f.write(COUNT.pack(count))
+    os.replace(tmp, path)
+
+
+class Snapshot(object):
+    """A checkpoint file, memory mapped for reading.
+
+    blocks is the list of (x0, y0, columns, rows, offset) of the blocks
+    in the file, offset being where their rows start.
+
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.width, self.height, self.generation, size = \
+            HEADER.unpack_from(self.map)
+        if magic != MAGIC or version not in (1, 2, VERSION):
+            self.close()
+            raise ValueError("not a life checkpoint: %s" % path)
+        self.rule = self.map[HEADER.size:HEADER.size + size].decode('ascii')
+        offset = HEADER.size + size
+        if version == 1:
+            self.blocks = [(0, 0, self.width, self.height, offset)]
+            return
+        count = 1
+        if version == VERSION:
+            count, = COUNT.unpack_from(self.map, offset)
+            offset += COUNT.size
+        self.blocks = []
+        for _ in range(count):
+            x0, y0, columns, rows = BLOCK.unpack_from(self.map, offset)
+            offset += BLOCK.size
+            self.blocks.append((x0, y0, columns, rows, offset))
+            offset += rows * ((columns + 7) // 8)
+
+    @property
+    def whole(self):
+        """True if the only block is the world, as saved from a torus."""
+        return len(self.blocks) == 1 and \
+               self.blocks[0][:4] == (0, 0, self.width, self.height)
+
+    def rows(self, block=0):
+        """Yield the packed rows of a block."""
+        _, _, columns, rows, offset = self.blocks[block]
+        stride = (columns + 7) // 8
+        for start in range(offset, offset + rows * stride, stride):
+            yield int.from_bytes(self.map[start:start + stride], 'little')
+
+    def cells(self, block=None):
+        """Yield the live cells of a block, or of every block."""
+        for i, (x0, y0, _, _, _) in enumerate(self.blocks):
+            if block is not None and i != block:
+                continue
+            for y, r in enumerate(self.rows(i), y0):
+                while r:
+                    low = r & -r
+                    yield (x0 + low.bit_length() - 1, y)
+                    r ^= low
+
+    def get(self, cell):
+        x, y = cell
+        for x0, y0, columns, rows, offset in self.blocks:
+            if x0 <= x < x0 + columns and y0 <= y < y0 + rows:
+                x -= x0
+                start = offset + (y - y0) * ((columns + 7) // 8)
+                return self.map[start + x // 8] >> (x % 8) & 1
+        return 0
+
+    def restore(self, life):
+        """Load the world into life, an empty engine of the same size.
+
+        Raises ValueError if the cells of an unbounded plane do not fit
+        in a torus engine.
+
+        """
+        if self.whole:
+            life.load_packed_rows(self.rows())
+            return life
+        if getattr(life, 'torus', True) and \
+           any(x0 < 0 or y0 < 0 or x0 + columns > life.width or
+               y0 + rows > life.height
+               for x0, y0, columns, rows, _ in self.blocks):
+            raise ValueError("the checkpoint does not fit in %dx%d" % (
+                life.width, life.height))
+        for i in range(len(self.blocks)):
+            life.set_many(list(self.cells(i)), 1)
+        return life
+
+    def load(self, engine):
+        """Build an engine (a class like Life) holding this world."""
+        return self.restore(engine(self.width, self.height, rule=self.rule))
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,114 @@
+"""
+Author: Leo Vidarte <http://nerdlabs.com.ar>
+
+This is free software,
+you can redistribute it and/or modify it
+under the terms of the GPL version 3
+as published by the Free Software Foundation.
+
+"""
+
+from collections import Counter
+
+from bit_life import bits
+from patterns import pattern_cells
+from rules import CONWAY, require_no_b0
+
+
+NEIGHBORS = ((-1, -1), (0, -1), (1, -1),
+             (-1,  0),          (1,  0),
+             (-1,  1), (0,  1), (1,  1))
+
+
+class SparseLife(object):
+    """Life engine that only stores the coordinates of live cells.
+
+    Each generation visits the live cells and their neighbors only, so
+    time and memory grow with the population instead of the board area.
+    With torus=True the world wraps at width/height like Life does;
+    with torus=False the plane is unbounded and width/height are only
+    the visible area.
+
+    """
+
+    @property
+    def rule(self):
+        return self._rule
+
+    @rule.setter
+    def rule(self, rule):
+        self._rule = require_no_b0(rule)
+
+    def __init__(self, width, height, rule=CONWAY, torus=True):
+        self.width = width
+        self.height = height
+        self.rule = rule
+        self.torus = torus
+        self.cells = set()
+        self.births = set()
+        self.deaths = set()
+
+    def evolve(self):
+        w, h = self.width, self.height
+        if self.torus:
+            counts = Counter(((x + dx) % w, (y + dy) % h)
+                             for x, y in self.cells for dx, dy in NEIGHBORS)
+        else:
+            counts = Counter((x + dx, y + dy)
+                             for x, y in self.cells for dx, dy in NEIGHBORS)
+        cells = self.cells
+        born, survive = self.rule.table
+        # Born or survive
+        self.cells = set(cell for cell, t in counts.items()
+                         if (survive if cell in cells else born)[t])
+        if survive[0]:
+            self.cells.update(cell for cell in cells if cell not in counts)
+        self.births = self.cells - cells
+        self.deaths = cells - self.cells
+        return self.cells
+
+    def set(self, cell, value):
+        if value:
+            self.cells.add(cell)
+        else:
+            self.cells.discard(cell)
+
+    def get(self, cell):
+        return 1 if cell in self.cells else 0
+
+    def set_many(self, cells, value):
+        if value:
+            self.cells.update(cells)
+        else:
+            self.cells.difference_update(cells)
+
+    def place_pattern(self, origin, pattern, mode='or'):
+        cells = pattern_cells(self, origin, pattern)
+        if mode == 'or':
+            self.cells.update(cells)
+        elif mode == 'xor':
+            self.cells.symmetric_difference_update(cells)
+        elif mode == 'clear':
+            self.cells.difference_update(cells)
+        else:
+            raise ValueError("unknown mode: %s" % mode)
+
+    def packed_rows(self):
+        rows = [0] * self.height
+        for x, y in self.cells:
+            if 0 <= x < self.width and 0 <= y < self.height:
+                rows[y] |= 1 << x
+        return rows
+
+    def load_packed_rows(self, rows):
+        self.cells = set((x, y) for y, r in enumerate(rows) for x in bits(r))
+
+    def live_cells(self, x0, y0, x1, y1):
+        """Yield the live cells within [x0, x1) x [y0, y1)."""
+        for x, y in self.cells:
+            if x0 <= x < x1 and y0 <= y < y1:
+                yield (x, y)
+
+    @property
+    def population(self):
+        return len(self.cells)
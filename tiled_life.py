@@ -0,0 +1,179 @@
+"""
+Author: Leo Vidarte <http://nerdlabs.com.ar>
+
+This is free software,
+you can redistribute it and/or modify it
+under the terms of the GPL version 3
+as published by the Free Software Foundation.
+
+"""
+
+from functools import partial
+
+from bit_life import (Changes, Diffed, apply_mask, block_changes,
+                      evolve_rows)
+from patterns import pattern_cells
+from rules import CONWAY, get_rule
+
+
+class TiledLife(Diffed):
+    """Life engine that only evaluates the tiles that may change.
+
+    The world is split into tiles of tile x tile cells, each a tuple of
+    packed rows. A tile is evaluated only if it or one of its eight
+    neighbors changed in the last generation; every other tile keeps
+    its tuple as is. active_tiles and skipped_tiles count both kinds
+    in the last evolve() call. The world wraps around like Life.
+
+    """
+
+    @property
+    def rule(self):
+        return self._rule
+
+    @rule.setter
+    def rule(self, rule):
+        self._rule = get_rule(rule)
+        # Tiles that were stable may change under the new rule
+        self.active = set(self.tiles)
+
+    def __init__(self, width, height, rule=CONWAY, tile=32):
+        self.width = width
+        self.height = height
+        self.tile = tile
+        self.tiles_x = (width + tile - 1) // tile
+        self.tiles_y = (height + tile - 1) // tile
+        self.tiles = {}
+        for ty in range(self.tiles_y):
+            for tx in range(self.tiles_x):
+                self.tiles[(tx, ty)] = (0,) * self.size((tx, ty))[1]
+        self.rule = rule
+        self.active_tiles = self.skipped_tiles = 0
+        self.changes = Changes()
+
+    def size(self, t):
+        tx, ty = t
+        return (min(self.tile, self.width - tx * self.tile),
+                min(self.tile, self.height - ty * self.tile))
+
+    def neighbors(self, t):
+        tx, ty = t
+        return set(((tx + dx) % self.tiles_x, (ty + dy) % self.tiles_y)
+                   for dy in (-1, 0, 1) for dx in (-1, 0, 1))
+
+    def evolve(self):
+        tiles = self.tiles
+        changed = {}
+        for t in self.active:
+            tile_ = self.evolve_tile(t)
+            if tile_ != tiles[t]:
+                changed[t] = tile_
+        self.active_tiles = len(self.active)
+        self.skipped_tiles = len(tiles) - self.active_tiles
+
+        active = set()
+        blocks = []
+        for t in changed:
+            active |= self.neighbors(t)
+            blocks.append((t[0] * self.tile, t[1] * self.tile, tiles[t],
+                           changed[t]))
+        self.changes = Changes(partial(block_changes, blocks))
+        tiles.update(changed)
+        self.active = active
+        return self.tiles
+
+    def evolve_tile(self, t):
+        """Next generation of tile t, read with a one cell halo."""
+        tx, ty = t
+        w, h = self.size(t)
+        left = ((tx - 1) % self.tiles_x, ty)
+        right = ((tx + 1) % self.tiles_x, ty)
+        lw = self.size(left)[0]
+
+        def row(y):
+            # Halo rows come from the tiles above and below
+            ty_ = ty
+            if y < 0:
+                ty_ = (ty - 1) % self.tiles_y
+                y = self.size((tx, ty_))[1] - 1
+            elif y >= h:
+                ty_ = (ty + 1) % self.tiles_y
+                y = 0
+            tiles = self.tiles
+            c = tiles[(tx, ty_)][y]
+            l = tiles[(left[0], ty_)][y] >> (lw - 1) & 1
+            r = tiles[(right[0], ty_)][y] & 1
+            return l | (c << 1) | (r << (w + 1))
+
+        ext = [row(y) for y in range(-1, h + 1)]
+        mask = (1 << w) - 1
+        return tuple((r >> 1) & mask
+                     for r in evolve_rows(ext, w + 2, self.rule))
+
+    def _locate(self, cell):
+        x, y = cell
+        tx, x0 = divmod(x, self.tile)
+        ty, y0 = divmod(y, self.tile)
+        return (tx, ty), x0, y0
+
+    def set(self, cell, value):
+        t, x, y = self._locate(cell)
+        rows = list(self.tiles[t])
+        if value:
+            rows[y] |= 1 << x
+        else:
+            rows[y] &= ~(1 << x)
+        self.tiles[t] = tuple(rows)
+        self.active |= self.neighbors(t)
+
+    def get(self, cell):
+        t, x, y = self._locate(cell)
+        return (self.tiles[t][y] >> x) & 1
+
+    def _apply(self, cells, mode):
+        """Update cells one tile at a time, a row mask per tile row."""
+        tiles = {}
+        for cell in cells:
+            t, x, y = self._locate(cell)
+            masks = tiles.setdefault(t, {})
+            masks[y] = masks.get(y, 0) | (1 << x)
+        for t, masks in tiles.items():
+            rows = list(self.tiles[t])
+            for y, mask in masks.items():
+                rows[y] = apply_mask(rows[y], mask, mode)
+            self.tiles[t] = tuple(rows)
+            self.active |= self.neighbors(t)
+
+    def set_many(self, cells, value):
+        self._apply(cells, 'or' if value else 'clear')
+
+    def place_pattern(self, origin, pattern, mode='or'):
+        self._apply(pattern_cells(self, origin, pattern), mode)
+
+    def packed_rows(self):
+        for ty in range(self.tiles_y):
+            for y in range(self.size((0, ty))[1]):
+                yield sum(self.tiles[(tx, ty)][y] << (tx * self.tile)
+                          for tx in range(self.tiles_x))
+
+    def load_packed_rows(self, rows):
+        for y, r in enumerate(rows):
+            ty, y0 = divmod(y, self.tile)
+            for tx in range(self.tiles_x):
+                t = (tx, ty)
+                w = self.size(t)[0]
+                tile = list(self.tiles[t])
+                tile[y0] = (r >> (tx * self.tile)) & ((1 << w) - 1)
+                self.tiles[t] = tuple(tile)
+        self.active = set(self.tiles)
+
+    @property
+    def population(self):
+        return sum(bin(r).count('1') for tile in self.tiles.values()
+                   for r in tile)
+
+    @property
+    def world(self):
+        """The tiles unpacked into the Life.world layout."""
+        return [[(r >> x) & 1 for x in range(self.width)]
+                for r in self.packed_rows()]